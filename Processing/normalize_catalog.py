@@ -12,6 +12,9 @@ Usage:
 
 Requires:
   pip install ollama pydantic
+
+Optional (faster HTML parsing and fingerprints):
+  pip install regex xxhash
 """
 
 from __future__ import annotations
@@ -20,18 +23,29 @@ from pydantic import BaseModel, Field, constr, ValidationError
 from datetime import datetime, timezone
 import hashlib
 import argparse
+import copy
+import functools
 import json
 import os
 import re
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
+from concurrent.futures import ProcessPoolExecutor
 import uuid
 
 # Although not directly used for the hardcoded HTML, keep ollama import for potential future use
 import ollama
 from bs4 import BeautifulSoup
 
+try:
+    import regex as _html_re
+except ImportError:  # stdlib fallback; same pattern syntax
+    _html_re = re
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 # -------------------------
 # Constants for HTML parsing
 # -------------------------
@@ -965,6 +979,13 @@ def _stable_id_hint(parts: List[str]) -> str:
     if not base: base = "unk"
     return hashlib.sha1(base.encode("utf-8")).hexdigest()[:10]
 
+def _fingerprint(raw: str) -> str:
+    # Non-cryptographic dedup ID for raw input lines; blake2b-64 when xxhash is missing
+    data = raw.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh3_64(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
 def _now_iso() -> str:
     # DeprecationWarning: datetime.datetime.utcnow() is deprecated
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
@@ -996,7 +1017,44 @@ def _parse_program_text_for_requirements(raw_text: str) -> Dict[str, Any]:
     # This function is deprecated and replaced by direct structured data from uw_se_scraper.py
     return {"required_by_term": {}, "course_lists": {}}
 
-def _parse_program_html_for_requirements(html_content: str) -> Dict[str, Any]:
+# Program-page patterns run on UTF-8 bytes: the HTML is encoded once per call and
+# only the captured groups are decoded. The third-party `regex` engine is used when
+# installed; the stdlib `re` accepts the same patterns.
+_TERM_SECTION_RE = _html_re.compile(
+    rb"<section class=\"\"><header data-test=\"grouping-\d+-header\"[^>]*><div><div class=\"style__itemHeaderH2___2f-ov\"><span>(?P<term_name>[1-4][AB])\s+Term</span></div>.*?</header>.*?(?=<section class=\"\"|<h3|$)",
+    _html_re.DOTALL | _html_re.IGNORECASE
+)
+_RULE_A_RE = _html_re.compile(
+    rb'<div data-test="ruleView-A-result">.*?<ul[^>]*>(?P<courses_html>.*?)</ul>',
+    _html_re.DOTALL | _html_re.IGNORECASE
+)
+_RULE_C_RE = _html_re.compile(
+    rb'<div data-test="ruleView-C-result">.*?Complete\s*<span>\s*1\s*</span>\s*of\s+the\s+following:\s*<div><ul[^>]*>(?P<courses_html>.*?)</ul></div></div>',
+    _html_re.DOTALL | _html_re.IGNORECASE
+)
+# Pattern: <li><span><a href="...">CODE</a> - Title <span>(credits)</span></span></li>
+# The dash alternation is hyphen, en dash and em dash as UTF-8 byte sequences.
+_RULE_COURSE_ITEM_RE = _html_re.compile(
+    rb'<li[^>]*>.*?<a[^>]*href="#/courses/view/[^"]*"[^>]*>(?P<code>[A-Z]{2,5}\s*\d{2,3}[A-Z]?)</a>\s*(?:-|\xe2\x80\x93|\xe2\x80\x94)\s*(?P<title>.*?)(?:\s*<span[^>]*>\([0-9.]+\)</span>|</span></li>)',
+    _html_re.DOTALL | _html_re.IGNORECASE
+)
+_LIST_SECTION_RE = _html_re.compile(
+    rb"<section class=\"\"><header(?: data-test=\"[^\"]+\")? class=\"\"><div><div class=\"style__itemHeaderH2___2f-ov\"><span>(?P<list_name>[^<]+?)</span></div>.*?</div>(?:<div[^>]*>)?(?:<ul>(?P<direct_courses_html>.*?)</ul>)?",
+    _html_re.DOTALL | _html_re.IGNORECASE
+)
+_NESTED_LIST_RE = _html_re.compile(
+    rb"<section class=\"\"><header(?: class=\"\")?><div><div class=\"style__itemHeaderH2___2f-ov\"><span>(?P<nested_list_name>List \d)</span></div>.*?</div>(?:<div[^>]*>)?(?:<ul>(?P<nested_courses_html>.*?)</ul>)?",
+    _html_re.DOTALL | _html_re.IGNORECASE
+)
+_LIST_COURSE_ITEM_RE = _html_re.compile(
+    rb"<li>\s*(?:<span>)?(?:<a[^>]*>)?(?P<code>[A-Z]{2,5}\s*\d{2,3}[A-Z]?)(?:</a>)?\s*(?:-|\xe2\x80\x93|\xe2\x80\x94)?\s*(?P<title>[^<]+?)(?:\s*<span[^>]*>\([0-9.]+\)</span>)?\s*</li>",
+    _html_re.DOTALL | _html_re.IGNORECASE
+)
+_PROGRAM_TITLE_RE = _html_re.compile(rb"<h2 class=\"program-view__title___x6bi1\">(.*?)</h2>")
+_TAG_RE = re.compile(r'<[^>]+>')
+
+@functools.lru_cache(maxsize=32)
+def _parse_program_html_cached(html_content: str) -> Dict[str, Any]:
     program_data = {
         "title": "",
         "required_by_term": {},
@@ -1005,10 +1063,11 @@ def _parse_program_html_for_requirements(html_content: str) -> Dict[str, Any]:
     }
 
     print("--- Starting _parse_program_html_for_requirements ---")
+    html_bytes = html_content.encode("utf-8")
     # Extract program title from h2
-    title_match = re.search(r"<h2 class=\"program-view__title___x6bi1\">(.*?)</h2>", html_content)
+    title_match = _PROGRAM_TITLE_RE.search(html_bytes)
     if title_match:
-        program_data["title"] = title_match.group(1).strip()
+        program_data["title"] = title_match.group(1).decode("utf-8").strip()
     # print(f"Parsed Program Title (from HTML): {program_data['title']}")
 
     # Extract term-based requirements
@@ -1020,62 +1079,41 @@ def _parse_program_html_for_requirements(html_content: str) -> Dict[str, Any]:
     #   </ul></div></div>
     # </section>
     
-    # Pattern to find term sections
-    term_section_pattern = re.compile(
-        r"<section class=\"\"><header data-test=\"grouping-\d+-header\"[^>]*><div><div class=\"style__itemHeaderH2___2f-ov\"><span>(?P<term_name>[1-4][AB])\s+Term</span></div>.*?</header>.*?(?=<section class=\"\"|<h3|$)",
-        re.DOTALL | re.IGNORECASE
-    )
-    
     # Extract courses from each term section
-    for term_match in term_section_pattern.finditer(html_content):
-        term_name = term_match.group("term_name")
+    for term_match in _TERM_SECTION_RE.finditer(html_bytes):
+        term_name = term_match.group("term_name").decode("utf-8")
         term_section = term_match.group(0)
         
         all_courses = []  # Courses that are ALL requirements
         any_courses = []  # Courses that are ANY requirements
         
         # Find ruleView-A-result (ALL requirements) - "Complete all the following"
-        rule_a_pattern = re.compile(
-            r'<div data-test="ruleView-A-result">.*?<ul[^>]*>(?P<courses_html>.*?)</ul>',
-            re.DOTALL | re.IGNORECASE
-        )
-        for rule_a_match in rule_a_pattern.finditer(term_section):
+        for rule_a_match in _RULE_A_RE.finditer(term_section):
             courses_html = rule_a_match.group("courses_html")
             # Extract course codes and titles from nested ul
-            # Pattern: <li><span><a href="...">CODE</a> - Title <span>(credits)</span></span></li>
             # Match title between </a> and the credits span or closing tag
-            course_item_pattern = re.compile(
-                r'<li[^>]*>.*?<a[^>]*href="#/courses/view/[^"]*"[^>]*>(?P<code>[A-Z]{2,5}\s*\d{2,3}[A-Z]?)</a>\s*[-–—]\s*(?P<title>.*?)(?:\s*<span[^>]*>\([0-9.]+\)</span>|</span></li>)',
-                re.DOTALL | re.IGNORECASE
-            )
-            for course_item_match in course_item_pattern.finditer(courses_html):
-                code = course_item_match.group("code").replace(" ", "")
-                title = course_item_match.group("title").strip()
-                # Clean up any remaining HTML entities or tags in the title
-                title = re.sub(r'<[^>]+>', '', title).strip()
+            for course_item_match in _RULE_COURSE_ITEM_RE.finditer(courses_html):
+                code = course_item_match.group("code").decode("utf-8").replace(" ", "")
+                title = course_item_match.group("title").decode("utf-8").strip()
+                # Clean up any remaining HTML tags in the title (rare; skip the regex when absent)
+                if '<' in title:
+                    title = _TAG_RE.sub('', title).strip()
                 all_courses.append({"code": code, "title": title})
         
         # Find ruleView-C-result (ANY requirements) - "Complete 1 of the following"
         # Note: ruleView-B-result is for general electives (not specific course lists)
         # ruleView-C-result is for "Complete 1 of the following: <course list>"
         # Format: <div data-test="ruleView-C-result">Complete <span>1</span> of the following: <div><ul>...</ul></div></div>
-        rule_c_pattern = re.compile(
-            r'<div data-test="ruleView-C-result">.*?Complete\s*<span>\s*1\s*</span>\s*of\s+the\s+following:\s*<div><ul[^>]*>(?P<courses_html>.*?)</ul></div></div>',
-            re.DOTALL | re.IGNORECASE
-        )
-        for rule_c_match in rule_c_pattern.finditer(term_section):
+        for rule_c_match in _RULE_C_RE.finditer(term_section):
             courses_html = rule_c_match.group("courses_html")
             
             # Extract from ul list (same pattern as ruleView-A-result to get titles too)
-            course_item_pattern = re.compile(
-                r'<li[^>]*>.*?<a[^>]*href="#/courses/view/[^"]*"[^>]*>(?P<code>[A-Z]{2,5}\s*\d{2,3}[A-Z]?)</a>\s*[-–—]\s*(?P<title>.*?)(?:\s*<span[^>]*>\([0-9.]+\)</span>|</span></li>)',
-                re.DOTALL | re.IGNORECASE
-            )
-            for course_item_match in course_item_pattern.finditer(courses_html):
-                code = course_item_match.group("code").replace(" ", "")
-                title = course_item_match.group("title").strip()
-                # Clean up any remaining HTML entities or tags in the title
-                title = re.sub(r'<[^>]+>', '', title).strip()
+            for course_item_match in _RULE_COURSE_ITEM_RE.finditer(courses_html):
+                code = course_item_match.group("code").decode("utf-8").replace(" ", "")
+                title = course_item_match.group("title").decode("utf-8").strip()
+                # Clean up any remaining HTML tags in the title (rare; skip the regex when absent)
+                if '<' in title:
+                    title = _TAG_RE.sub('', title).strip()
                 any_courses.append({"code": code, "title": title})
         
         # Store ALL (required) courses in required_by_term
@@ -1095,26 +1133,16 @@ def _parse_program_html_for_requirements(html_content: str) -> Dict[str, Any]:
                     any_courses_dicts.append({"code": item, "title": ""})
             program_data["any_requirements_by_term"][term_name] = any_courses_dicts
 
-    # Regex to find general course lists (electives, etc.)
-    # This pattern needs to be more robust to find nested lists as well
-    list_section_pattern = re.compile(
-        r"<section class=\"\"><header(?: data-test=\"[^\"]+\")? class=\"\"><div><div class=\"style__itemHeaderH2___2f-ov\"><span>(?P<list_name>[^<]+?)</span></div>.*?</div>(?:<div[^>]*>)?(?:<ul>(?P<direct_courses_html>.*?)</ul>)?",
-        re.DOTALL | re.IGNORECASE
-    )
-
-    for list_match in list_section_pattern.finditer(html_content):
-        list_name = list_match.group("list_name").strip()
+    # Find general course lists (electives, etc.)
+    for list_match in _LIST_SECTION_RE.finditer(html_bytes):
+        list_name = list_match.group("list_name").decode("utf-8").strip()
         direct_courses_html = list_match.group("direct_courses_html")
         
         current_list_courses = []
         if direct_courses_html:
-            course_item_pattern = re.compile(
-                r"<li>\s*(?:<span>)?(?:<a[^>]*>)?(?P<code>[A-Z]{2,5}\s*\d{2,3}[A-Z]?)(?:</a>)?\s*[-–—]?\s*(?P<title>[^<]+?)(?:\s*<span[^>]*>\([0-9.]+\)</span>)?\s*</li>",
-                re.DOTALL | re.IGNORECASE
-            )
-            for course_item_match in course_item_pattern.finditer(direct_courses_html):
-                code = course_item_match.group("code").replace(" ", "")
-                title = course_item_match.group("title").strip()
+            for course_item_match in _LIST_COURSE_ITEM_RE.finditer(direct_courses_html):
+                code = course_item_match.group("code").decode("utf-8").replace(" ", "")
+                title = course_item_match.group("title").decode("utf-8").strip()
                 current_list_courses.append({"code": code, "title": title})
 
         if current_list_courses:
@@ -1124,23 +1152,15 @@ def _parse_program_html_for_requirements(html_content: str) -> Dict[str, Any]:
         # We need to search within the current list_match's span for nested sections
         # This requires re-parsing the inner HTML of the current section
         inner_section_html = list_match.group(0) # Get the full HTML of the current section
-        nested_list_pattern = re.compile(
-            r"<section class=\"\"><header(?: class=\"\")?><div><div class=\"style__itemHeaderH2___2f-ov\"><span>(?P<nested_list_name>List \d)</span></div>.*?</div>(?:<div[^>]*>)?(?:<ul>(?P<nested_courses_html>.*?)</ul>)?",
-            re.DOTALL | re.IGNORECASE
-        )
-        for nested_list_match in nested_list_pattern.finditer(inner_section_html):
-            nested_list_name = nested_list_match.group("nested_list_name").strip()
+        for nested_list_match in _NESTED_LIST_RE.finditer(inner_section_html):
+            nested_list_name = nested_list_match.group("nested_list_name").decode("utf-8").strip()
             nested_courses_html = nested_list_match.group("nested_courses_html")
 
             nested_courses_in_list = []
             if nested_courses_html:
-                course_item_pattern = re.compile(
-                    r"<li>\s*(?:<span>)?(?:<a[^>]*>)?(?P<code>[A-Z]{2,5}\s*\d{2,3}[A-Z]?)(?:</a>)?\s*[-–—]?\s*(?P<title>[^<]+?)(?:\s*<span[^>]*>\([0-9.]+\)</span>)?\s*</li>",
-                    re.DOTALL | re.IGNORECASE
-                )
-                for nested_course_item_match in course_item_pattern.finditer(nested_courses_html):
-                    code = nested_course_item_match.group("code").replace(" ", "")
-                    title = nested_course_item_match.group("title").strip()
+                for nested_course_item_match in _LIST_COURSE_ITEM_RE.finditer(nested_courses_html):
+                    code = nested_course_item_match.group("code").decode("utf-8").replace(" ", "")
+                    title = nested_course_item_match.group("title").decode("utf-8").strip()
                     nested_courses_in_list.append({"code": code, "title": title})
 
             if nested_courses_in_list:
@@ -1148,6 +1168,11 @@ def _parse_program_html_for_requirements(html_content: str) -> Dict[str, Any]:
 
     return program_data
 
+def _parse_program_html_for_requirements(html_content: str) -> Dict[str, Any]:
+    # Re-scrapes repeat the same program page; parse each distinct HTML once and
+    # hand every caller its own copy so the cached result is never mutated.
+    return copy.deepcopy(_parse_program_html_cached(html_content))
+
 def _inject_sets_from_required_by_term(out: OutputEnvelope, program_data: Dict[str, Any], any_requirements_by_term: Dict[str, List[Union[str, Dict[str, str]]]] = None):
     # Note: 'out' is the OutputEnvelope, 'program_data' is the dict from _parse_program_html_for_requirements
     # 'any_requirements_by_term' maps term -> list of course codes (or dicts with code/title) that are "select one" (ANY requirements)
@@ -1155,6 +1180,10 @@ def _inject_sets_from_required_by_term(out: OutputEnvelope, program_data: Dict[s
     if any_requirements_by_term is None:
         any_requirements_by_term = {}
     
+    # Sets/nodes below are built from already-parsed data, so skip pydantic validation
+    cs_append = out.course_sets.append
+    req_append = out.requirements.append
+    
     for term_name, courses_data in program_data.get("required_by_term", {}).items():
         course_codes = [course["code"] for course in courses_data]
         any_items_for_term = any_requirements_by_term.get(term_name, [])
@@ -1204,38 +1233,38 @@ def _inject_sets_from_required_by_term(out: OutputEnvelope, program_data: Dict[s
         # Create ALL requirement node for required courses (if any)
         if all_courses:
             all_set_id_hint = f"req_term_{term_name.lower().replace(' ', '')}_all"
-            out.course_sets.append(CourseSet(
+            cs_append(CourseSet.model_construct(
                 id_hint=all_set_id_hint,
                 mode="explicit",
                 title=f"Required {term_name}",
                 selector=None,
                 courses=all_courses
             ))
-            req_node = RequirementNode(
+            req_node = RequirementNode.model_construct(
                 id_hint=all_set_id_hint,
                 type="ALL",
                 courseSet=all_set_id_hint,
                 explanations=[f"Required courses in term {term_name}."]
             )
-            out.requirements.append(req_node)
+            req_append(req_node)
         
         # Create ANY requirement node for select-one courses (if any)
         if any_courses:
             any_set_id_hint = f"req_term_{term_name.lower().replace(' ', '')}_any"
-            out.course_sets.append(CourseSet(
+            cs_append(CourseSet.model_construct(
                 id_hint=any_set_id_hint,
                 mode="explicit",
                 title=f"Select one from {term_name}",
                 selector=None,
                 courses=any_courses
             ))
-            req_node = RequirementNode(
+            req_node = RequirementNode.model_construct(
                 id_hint=any_set_id_hint,
                 type="ANY",
                 courseSet=any_set_id_hint,
                 explanations=[f"Complete 1 of the following courses in term {term_name}."]
             )
-            out.requirements.append(req_node)
+            req_append(req_node)
             
             # Create Course entries for ANY courses if they don't exist
             # Extract course info from any_requirements_by_term if available
@@ -1272,11 +1301,14 @@ def _inject_sets_from_required_by_term(out: OutputEnvelope, program_data: Dict[s
 def _inject_sets_from_course_lists(out: OutputEnvelope, program_data: Dict[str, Any]):
     # Note: 'out' is the OutputEnvelope, 'program_data' is the dict from _parse_program_html_for_requirements
     # This function creates CourseSets and RequirementNodes and appends them to 'out'
+    # (built from already-parsed data, so pydantic validation is skipped)
+    cs_append = out.course_sets.append
+    req_append = out.requirements.append
     for list_name, courses_data in program_data.get("course_lists", {}).items():
         set_id_hint = f"course_list_{re.sub(r'[^a-zA-Z0-9_]', '', list_name).lower()}"
 
         course_codes = [course["code"] for course in courses_data]
-        out.course_sets.append(CourseSet(
+        cs_append(CourseSet.model_construct(
             id_hint=set_id_hint,
             mode="explicit",
             title=list_name,
@@ -1286,13 +1318,13 @@ def _inject_sets_from_course_lists(out: OutputEnvelope, program_data: Dict[str,
         
         # Create a requirement node for this course list
         # This will typically be an ANY requirement (choose any from this list)
-        req_node = RequirementNode(
+        req_node = RequirementNode.model_construct(
             id_hint=set_id_hint, # Use the course set id_hint here
             type="ANY",
             courseSet=set_id_hint, # Reference to the course set by its id_hint
             explanations=[f"Complete courses from {list_name}."]
         )
-        out.requirements.append(req_node)
+        req_append(req_node)
 
 def _build_user_prompt(scraped: Dict[str, Any]) -> str:
     return (
@@ -1352,31 +1384,6 @@ def _normalize_requirements(envelope: OutputEnvelope) -> None:
     for i, rn in enumerate(envelope.requirements):
         assign_ids(rn, f"req{i}")
 
-def _inject_sets_from_course_lists(out: OutputEnvelope, program_data: Dict[str, Any]):
-    # Note: 'out' is the OutputEnvelope, 'program_data' is the dict from _parse_program_html_for_requirements
-    # This function creates CourseSets and RequirementNodes and appends them to 'out'
-    for list_name, courses_data in program_data.get("course_lists", {}).items():
-        set_id_hint = f"course_list_{re.sub(r'[^a-zA-Z0-9_]', '', list_name).lower()}"
-
-        course_codes = [course["code"] for course in courses_data]
-        out.course_sets.append(CourseSet(
-            id_hint=set_id_hint,
-            mode="explicit",
-            title=list_name,
-            selector=None,
-            courses=course_codes
-        ))
-        
-        # Create a requirement node for this course list
-        # This will typically be an ANY requirement (choose any from this list)
-        req_node = RequirementNode(
-            id_hint=set_id_hint, # Use the course set id_hint here
-            type="ANY",
-            courseSet=set_id_hint, # Reference to the course set by its id_hint
-            explanations=[f"Complete courses from {list_name}."]
-        )
-        out.requirements.append(req_node)
-
 def _ensure_provenance(out: OutputEnvelope, scraped: Dict[str, Any]):
     out.provenance = {
         "timestamp": _now_iso(),
@@ -1456,12 +1463,15 @@ def normalize_scraped(scraped: Dict[str, Any]) -> OutputEnvelope:
             "any_requirements_by_term": {}  # Will be populated from HTML parsing
         }
         
-        # Step 2: If structured data is empty or missing, OR if we have HTML, parse HTML as fallback
+        # Step 2: If structured data is empty or missing, parse HTML as fallback.
+        # The HTML is also the only source of "Complete 1 of the following" (ruleView-C)
+        # groups, so a cheap substring check decides whether the full parse is needed.
         has_html = scraped.get("raw_program_html")
         needs_html_parsing = (
             not program_data["required_by_term"] or 
             not program_data["course_lists"] or
-            has_html  # Always parse HTML to detect "Complete 1 of the following" patterns
+            not program_data["title"] or
+            (has_html and "ruleView-C-result" in has_html)
         )
         
         if needs_html_parsing and has_html:
@@ -1493,9 +1503,14 @@ def normalize_scraped(scraped: Dict[str, Any]) -> OutputEnvelope:
         )
         
         # Generate course sets and requirements from the cleaned program data
+        # (the same dicts ProgramShell was built from, so no model_dump round-trip)
         # Pass any_requirements info so we can create ANY nodes
-        _inject_sets_from_required_by_term(out, out.program.model_dump(), program_data.get("any_requirements_by_term", {}))
-        _inject_sets_from_course_lists(out, out.program.model_dump())
+        cleaned_program_data = {
+            "required_by_term": cleaned_required_by_term,
+            "course_lists": cleaned_course_lists,
+        }
+        _inject_sets_from_required_by_term(out, cleaned_program_data, program_data.get("any_requirements_by_term", {}))
+        _inject_sets_from_course_lists(out, cleaned_program_data)
 
     # Process individual course data
     # This part should be after program data processing to ensure program-related course sets are available.
@@ -1551,7 +1566,7 @@ def process_single_entry(scraped: Dict[str, Any]) -> Dict[str, Any]:
         env = OutputEnvelope(
             provenance={
                 "ingested_at": _now_iso(),
-                "fingerprint": hashlib.sha1(scraped.get("raw","").encode("utf-8")).hexdigest(),
+                "fingerprint": _fingerprint(scraped.get("raw", "")),
                 "error": f"JSON parse error on line {scraped.get('_line')}: {scraped.get('_error')}"
             }
         )
@@ -1560,6 +1575,20 @@ def process_single_entry(scraped: Dict[str, Any]) -> Dict[str, Any]:
     
     return json.loads(env.model_dump_json())
 
+def _process_entry_or_none(scraped: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Pool task: a failing entry is reported and skipped instead of aborting map()."""
+    try:
+        return process_single_entry(scraped)
+    except Exception as exc:
+        print(f"Entry generated an exception: {exc}", file=sys.stderr)
+        return None
+
+def _worker_init() -> None:
+    """Warm a pool worker so its first entry isn't slower than the rest."""
+    # Patterns and pydantic validators are built at import; push one empty entry
+    # through the same normalize/serialize path the worker will run.
+    process_single_entry({})
+
 # -------------------------
 # I/O
 # -------------------------
@@ -1601,42 +1630,26 @@ def main():
     fout = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
 
     try:
-        # Thread-safe writing with a lock
-        write_lock = threading.Lock()
-        
-        # Read all entries first to enable concurrent processing
-        scraped_entries = list(read_jsonl(fin))
-        
-        # Process entries concurrently in batches
+        # Process entries concurrently; map() yields results in input order, so the
+        # main thread is the only writer and no lock is needed.
         batch = []
         batch_size = 5
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
-            future_to_entry = {
-                executor.submit(process_single_entry, scraped): scraped 
-                for scraped in scraped_entries
-            }
-            
-            # Process completed tasks as they finish
-            for future in as_completed(future_to_entry):
-                try:
-                    result = future.result()
-                    batch.append(result)
-                    
-                    # Write batch when it reaches the batch size
-                    if len(batch) >= batch_size:
-                        with write_lock:
-                            write_jsonl(fout, batch)
-                        batch = []  # Reset batch
-                        
-                except Exception as exc:
-                    print(f"Entry generated an exception: {exc}", file=sys.stderr)
+        # Normalization is CPU-bound pure Python, so use processes rather than threads
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_worker_init) as executor:
+            for result in executor.map(_process_entry_or_none, read_jsonl(fin), chunksize=32):
+                if result is None:
+                    continue
+                batch.append(result)
+                
+                # Write batch when it reaches the batch size
+                if len(batch) >= batch_size:
+                    write_jsonl(fout, batch)
+                    batch.clear()
         
         # Write any remaining entries in the final batch
         if batch:
-            with write_lock:
-                write_jsonl(fout, batch)
+            write_jsonl(fout, batch)
             
     finally:
         if fin is not sys.stdin: fin.close()
@@ -1,17 +1,11 @@
 import json
 import uwflow_api
-from dataclasses import asdict
+from pathlib import Path
 
 def main():
     with open('nodes.json', 'r') as f:
         nodes = json.load(f)
-    with open('courses.jsonl', 'w') as f:
-        for node in nodes:
-            course_code = node['id']
-            print(course_code)
-
-            course = uwflow_api.fetch_course(course_code)
-            if course:
-                f.write(json.dumps(asdict(course), ensure_ascii=False) + '\n')
+    # One batched GraphQL request per 50 nodes instead of one per node
+    uwflow_api.fetch_multiple_courses([node['id'] for node in nodes], Path('courses.jsonl'))
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -5,35 +5,34 @@ Parse prerequisites from UWFlow data and convert to edges format.
 Reads courses.jsonl and generates edges.json compatible with the frontend.
 """
 
-import json
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, NamedTuple
 
-COURSE_RE = re.compile(r"\b([A-Z]{2,6})\s?(\d{2,4}[A-Z]?)\b")
+from uwflow_common import COURSE_RE, HAS_DIGIT_RE, find_codes, iter_jsonl_lines, json_loads, norm, write_json
 
-def norm(code: str) -> str:
-    """Normalize course code to uppercase without spaces"""
-    if not code:
-        return ""
-    # Try uppercase first, then lowercase
-    code_upper = code.upper()
-    m = COURSE_RE.search(code_upper)
-    if m:
-        return (m.group(1) + m.group(2)).upper()
-    # If no match, try to extract pattern manually (e.g., "cs341" -> "CS341")
-    code_no_spaces = code.upper().replace(' ', '')
-    # Pattern: 2-6 letters followed by 2-4 digits optionally followed by a letter
-    match = re.match(r'^([A-Z]{2,6})(\d{2,4}[A-Z]?)$', code_no_spaces)
-    if match:
-        return match.group(1) + match.group(2)
-    return ""
+# Single-pass prerequisite scanner. Alternatives, in order:
+#   semi/oneof - start of text or ';' (a new clause), flagged "oneof" when the clause opens with "One of"
+#   or         - zero-width at " or " followed by more clause text
+#   groups 4-5 - a course code (COURSE_RE's subject and number groups)
+_PARSE_RE = re.compile(
+    r"(?P<semi>;|^)(?:(?=(?P<oneof>\s*(?i:one\s+of\s))))?"
+    r"|(?P<or>(?= (?i:or) [^;]*?[^\s;]))"
+    r"|" + COURSE_RE.pattern
+)
 
-def find_codes(text: str) -> List[str]:
-    """Extract all course codes from text"""
-    return [(a + b).upper() for a, b in COURSE_RE.findall(text or "")]
+class Edge(NamedTuple):
+    """One graph edge; converted to the frontend's dict shape only when written out."""
+    source: str
+    target: str
+    type: str
+    logic: str
+    group_id: str
 
-def parse_prereqs_text(prereqs_text: str, course_id: str) -> List[Dict[str, Any]]:
+def parse_prereqs_text(prereqs_text: str, course_id: str) -> List[Edge]:
     """
     Parse free-form prerequisite text into structured edges.
     
@@ -42,191 +41,151 @@ def parse_prereqs_text(prereqs_text: str, course_id: str) -> List[Dict[str, Any]
     - "One of CS245, CS245E, SE212" -> ANY logic group  
     - "CS240; MATH239" -> separate groups (both required)
     
-    Returns list of edge dictionaries compatible with frontend format.
+    Returns list of Edge tuples.
     """
-    if not prereqs_text:
+    if not prereqs_text or not HAS_DIGIT_RE.search(prereqs_text):
         return []
     
     edges = []
-    # Split by semicolons to get major clauses
-    clauses = [c.strip() for c in prereqs_text.split(';')]
-    
+    target = course_id.upper()
     group_counter = 0
-    for clause in clauses:
-        clause_lower = clause.lower()
-        
+    # Clauses are separated by semicolons; one _PARSE_RE scan walks the text once,
+    # collecting each clause's codes and logic and flushing a group at every ';'
+    clause_start = 0
+    one_of = has_or = False
+    codes: List[str] = []
+    
+    def flush() -> None:
+        nonlocal group_counter
         # Skip non-course clauses (program restrictions, etc.)
-        codes = find_codes(clause)
-        if not codes or course_id.upper() in codes:
-            continue
-        
-        # Check for "One of" pattern
-        if re.match(r'(?i)^one\s+of\s+', clause):
-            # Extract everything after "One of"
-            rest = re.sub(r'(?i)^one\s+of\s+', '', clause)
-            codes = find_codes(rest)
-            if codes:
-                group_counter += 1
-                gid = f"{course_id}_prereq_oneof_{group_counter}"
-                for code in codes:
-                    edges.append({
-                        "source": code,
-                        "target": course_id.upper(),
-                        "type": "PREREQ",
-                        "logic": "ANY",
-                        "group_id": gid
-                    })
-        
-        # Check for "or" pattern (e.g., "CS240 or CS240E")
-        elif ' or ' in clause_lower:
-            codes = find_codes(clause)
-            if codes:
-                group_counter += 1
-                gid = f"{course_id}_prereq_or_{group_counter}"
-                for code in codes:
-                    edges.append({
-                        "source": code,
-                        "target": course_id.upper(),
-                        "type": "PREREQ",
-                        "logic": "ANY",
-                        "group_id": gid
-                    })
-        
+        if not codes or target in codes:
+            return
+        group_counter += 1
+        if one_of:
+            logic, gid = "ANY", f"{course_id}_prereq_oneof_{group_counter}"
+        elif has_or:
+            logic, gid = "ANY", f"{course_id}_prereq_or_{group_counter}"
         # Otherwise, treat as "ALL" (all codes in clause must be taken)
         else:
-            codes = find_codes(clause)
-            if codes:
-                group_counter += 1
-                gid = f"{course_id}_prereq_all_{group_counter}"
-                for code in codes:
-                    edges.append({
-                        "source": code,
-                        "target": course_id.upper(),
-                        "type": "PREREQ",
-                        "logic": "ALL",
-                        "group_id": gid
-                    })
+            logic, gid = "ALL", f"{course_id}_prereq_all_{group_counter}"
+        edges.extend(Edge(code, target, "PREREQ", logic, gid) for code in codes)
+    
+    for m in _PARSE_RE.finditer(prereqs_text):
+        kind = m.lastgroup
+        if kind is None:  # course code
+            codes.append(sys.intern(m.group(4) + m.group(5)))
+        elif kind == "or":
+            # " or " only counts between words of the clause, not in its edge whitespace
+            if not has_or and prereqs_text[clause_start:m.start()].strip():
+                has_or = True
+        else:  # clause boundary, possibly opening with "One of"
+            flush()
+            clause_start = m.end()
+            one_of = kind == "oneof"
+            has_or = False
+            codes = []
+    flush()
     
     return edges
 
-def parse_antireqs_text(antireqs_text: str, course_id: str) -> List[Dict[str, Any]]:
+def parse_antireqs_text(antireqs_text: str, course_id: str) -> List[Edge]:
     """Parse antirequisites (exclusions) from text"""
     if not antireqs_text:
         return []
     
-    codes = find_codes(antireqs_text)
-    edges = []
-    if codes:
-        gid = f"{course_id}_antireq_1"
-        for code in codes:
-            if code != course_id.upper():
-                edges.append({
-                    "source": code,
-                    "target": course_id.upper(),
-                    "type": "ANTIREQ",
-                    "logic": "ANY",
-                    "group_id": gid
-                })
-    return edges
+    target = course_id.upper()
+    gid = f"{course_id}_antireq_1"
+    return [Edge(code, target, "ANTIREQ", "ANY", gid) for code in find_codes(antireqs_text) if code != target]
 
-def parse_coreqs_text(coreqs_text: str, course_id: str) -> List[Dict[str, Any]]:
+def parse_coreqs_text(coreqs_text: str, course_id: str) -> List[Edge]:
     """
     Parse corequisites from text.
     Corequisites are bidirectional - if A is a corequisite of B, then B is also a corequisite of A.
-    So we create edges in both directions.
+    Only the code -> course_id direction is emitted here; generate_edges_from_uwflow adds
+    the reverse edges in a single symmetrization pass once every course is parsed.
     """
     if not coreqs_text:
         return []
     
-    codes = find_codes(coreqs_text)
-    edges = []
-    if codes:
-        gid = f"{course_id}_coreq_1"
-        for code in codes:
-            code_upper = code.upper()
-            course_id_upper = course_id.upper()
-            if code_upper != course_id_upper:
-                # Create edge: code -> course_id (code is corequisite of course_id)
-                edges.append({
-                    "source": code_upper,
-                    "target": course_id_upper,
-                    "type": "COREQ",
-                    "logic": "ANY",
-                    "group_id": gid
-                })
-                # Create reverse edge: course_id -> code (course_id is corequisite of code)
-                edges.append({
-                    "source": course_id_upper,
-                    "target": code_upper,
-                    "type": "COREQ",
-                    "logic": "ANY",
-                    "group_id": f"{code_upper}_coreq_1"
-                })
+    course_id_upper = course_id.upper()
+    gid = f"{course_id}_coreq_1"
+    # Create edge: code -> course_id (code is corequisite of course_id)
+    return [Edge(code, course_id_upper, "COREQ", "ANY", gid) for code in find_codes(coreqs_text) if code != course_id_upper]
+
+def _course_edge_tuples(course_data: Dict[str, Any]) -> List[Edge]:
+    """All (not yet deduplicated) edge tuples for one UWFlow course record"""
+    course_code = norm(course_data.get("code", ""))
+    if not course_code:
+        return []
+    
+    edges: List[Edge] = []
+    
+    # Parse prerequisites
+    prereqs_text = course_data.get("prereqs")
+    if prereqs_text:
+        edges.extend(parse_prereqs_text(prereqs_text, course_code))
+    
+    # Also use structured prerequisite_courses as fallback
+    prerequisite_courses = course_data.get("prerequisite_courses", [])
+    if prerequisite_courses and not prereqs_text:
+        # If we have structured data but no text, create simple edges
+        gid = f"{course_code}_prereq_structured"
+        edges.extend(
+            Edge(prereq_code, course_code, "PREREQ", "ANY", gid)
+            for prereq_code in (norm(prereq.get("code", "")) for prereq in prerequisite_courses)
+            if prereq_code and prereq_code != course_code
+        )
+    
+    # Parse antirequisites
+    antireqs_text = course_data.get("antireqs")
+    if antireqs_text:
+        edges.extend(parse_antireqs_text(antireqs_text, course_code))
+    
+    # Parse corequisites (reverse direction is added after all courses are parsed)
+    coreqs_text = course_data.get("coreqs")
+    if coreqs_text:
+        edges.extend(parse_coreqs_text(coreqs_text, course_code))
+    
     return edges
 
-def generate_edges_from_uwflow(uwflow_jsonl_path: Path) -> List[Dict[str, Any]]:
-    """Read UWFlow JSONL and generate edges"""
-    edges = []
+def _edges_in_range(uwflow_jsonl_path: Path, start: int, end: int) -> List[Edge]:
+    """Edge tuples for the JSONL lines whose first byte falls in [start, end)"""
+    edges: List[Edge] = []
+    for line in iter_jsonl_lines(uwflow_jsonl_path, start, end):
+        edges.extend(_course_edge_tuples(json_loads(line)))
+    return edges
+
+def generate_edges_from_uwflow(uwflow_jsonl_path: Path, workers: int = 1) -> List[Edge]:
+    """Read UWFlow JSONL and generate edges
+
+    With workers > 1 the file is split into newline-aligned byte ranges parsed in
+    separate processes; ranges are merged in file order, so output is identical.
+    """
+    edges: List[Edge] = []
     seen_edges = set()  # Track (source, target, type) to avoid duplicates
+
+    def add_edges(new_edges: Iterable[Edge]) -> None:
+        for edge in new_edges:
+            edge_key = edge[:3]  # (source, target, type)
+            if edge_key not in seen_edges:
+                seen_edges.add(edge_key)
+                edges.append(edge)
+    
+    size = uwflow_jsonl_path.stat().st_size
+    if workers <= 1:
+        add_edges(_edges_in_range(uwflow_jsonl_path, 0, size))
+    else:
+        bounds = [size * k // workers for k in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(_edges_in_range, repeat(uwflow_jsonl_path), bounds[:-1], bounds[1:]):
+                add_edges(chunk)
     
-    with open(uwflow_jsonl_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if not line.strip():
-                continue
-            course_data = json.loads(line)
-            course_code = norm(course_data.get("code", ""))
-            
-            if not course_code:
-                continue
-            
-            # Parse prerequisites
-            prereqs_text = course_data.get("prereqs")
-            if prereqs_text:
-                prereq_edges = parse_prereqs_text(prereqs_text, course_code)
-                for edge in prereq_edges:
-                    edge_key = (edge["source"], edge["target"], edge["type"])
-                    if edge_key not in seen_edges:
-                        edges.append(edge)
-                        seen_edges.add(edge_key)
-            
-            # Also use structured prerequisite_courses as fallback
-            prerequisite_courses = course_data.get("prerequisite_courses", [])
-            if prerequisite_courses and not prereqs_text:
-                # If we have structured data but no text, create simple edges
-                for prereq in prerequisite_courses:
-                    prereq_code = norm(prereq.get("code", ""))
-                    if prereq_code and prereq_code != course_code:
-                        edge_key = (prereq_code, course_code, "PREREQ")
-                        if edge_key not in seen_edges:
-                            edges.append({
-                                "source": prereq_code,
-                                "target": course_code,
-                                "type": "PREREQ",
-                                "logic": "ANY",
-                                "group_id": f"{course_code}_prereq_structured"
-                            })
-                            seen_edges.add(edge_key)
-            
-            # Parse antirequisites
-            antireqs_text = course_data.get("antireqs")
-            if antireqs_text:
-                antireq_edges = parse_antireqs_text(antireqs_text, course_code)
-                for edge in antireq_edges:
-                    edge_key = (edge["source"], edge["target"], edge["type"])
-                    if edge_key not in seen_edges:
-                        edges.append(edge)
-                        seen_edges.add(edge_key)
-            
-            # Parse corequisites
-            # Note: Corequisites are bidirectional, so parse_coreqs_text creates edges in both directions
-            coreqs_text = course_data.get("coreqs")
-            if coreqs_text:
-                coreq_edges = parse_coreqs_text(coreqs_text, course_code)
-                for edge in coreq_edges:
-                    edge_key = (edge["source"], edge["target"], edge["type"])
-                    if edge_key not in seen_edges:
-                        edges.append(edge)
-                        seen_edges.add(edge_key)
+    # Corequisites are symmetric: one pass adds every reverse edge not already present
+    # (course_id -> code, grouped under the code's own coreq group)
+    add_edges([
+        Edge(edge.target, edge.source, "COREQ", "ANY", f"{edge.source}_coreq_1")
+        for edge in edges if edge.type == "COREQ"
+    ])
     
     return edges
 
@@ -235,6 +194,8 @@ def main():
     parser = argparse.ArgumentParser(description="Parse prerequisites from UWFlow data")
     parser.add_argument("--input", default="courses.jsonl", help="Input UWFlow JSONL file")
     parser.add_argument("--output", default="edges.json", help="Output edges JSON file")
+    parser.add_argument("--pretty", action="store_true", help="Indent output JSON (2 spaces) for human review")
+    parser.add_argument("--workers", type=int, default=1, help="Parser processes for large inputs (default: 1)")
     args = parser.parse_args()
     
     input_path = Path(args.input)
@@ -243,13 +204,12 @@ def main():
         return
     
     print(f"Reading UWFlow data from {input_path}...")
-    edges = generate_edges_from_uwflow(input_path)
+    edges = generate_edges_from_uwflow(input_path, workers=args.workers)
     
     print(f"Generated {len(edges)} edges")
     
     output_path = Path(args.output)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(edges, f, indent=2)
+    write_json(output_path, [edge._asdict() for edge in edges], ensure_ascii=True, pretty=args.pretty)
     
     print(f"Wrote edges to {output_path}")
 
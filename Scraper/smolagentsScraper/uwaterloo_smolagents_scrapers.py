@@ -5,13 +5,31 @@
 #
 # Usage examples are at bottom (CLI).
 
+import atexit
+import gzip
+import hashlib
 import json
+import os
 import re
+import threading
 import time
 from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Tuple, Any
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Any
 
 from bs4 import BeautifulSoup
+from bs4.element import PreformattedString, Tag
+from lxml import etree, html as lxml_html
+try:
+    # Optional: C (Lexbor) HTML parser for the program-lists path; lxml is used otherwise
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+try:
+    # Optional: faster JSON for the html/json_blobs payloads passed between the tools
+    import orjson
+except ImportError:
+    orjson = None
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
 
 # smolagents imports (we use Tool API so these can be plugged into an agent)
@@ -23,17 +41,46 @@ from smolagents import Tool
 
 COURSE_CODE_RE = re.compile(r"\b([A-Z]{2,8})\s?(\d{2,3}[A-Z]?)\b")
 
+# Compiled once: the predicates below run against every tag on a page
+_WS_RE = re.compile(r"\s+")
+_LIST_N_RE = re.compile(r"\blist\s*[1-9]\b")
+_HEADING_TAG_RE = re.compile(r"^h[1-6]$", re.I)
+_H1_4_RE = re.compile(r"^h[1-4]$", re.I)
+_UNITS_TAIL_RE = re.compile(r"\((\d+\.\d{2})\)\s*$")
+_UNITS_STRIP_RE = re.compile(r"\(\s*\d+\.\d{2}\s*\)\s*$")
+# List-title heuristics in one pass over lowercased text: a known section name (whole
+# string), "list 1".."list 9", or "list" together with a list keyword in either order
+_LIST_TITLE_RE = re.compile(
+    r"^(?:undergraduate communication requirement|communication requirement|natural sciences? list"
+    r"|technical electives(?: list)?|complementary studies electives|complementary studies elective list"
+    r"|additional requirements?)$"
+    r"|\blist\s*[1-9]\b"
+    r"|list.*(?:natural|science|technical|elective|complementary)"
+    r"|(?:natural|science|technical|elective|complementary).*list",
+    re.S,
+)
+_REQ_LABELS = ("Prerequisites", "Corequisites", "Antirequisites")
+_REQ_LABEL_RES = {label: re.compile(rf"^{re.escape(label)}", re.I) for label in _REQ_LABELS}
+
+def _json_dumps(obj: Any) -> str:
+    """Compact JSON text; non-ASCII is kept as-is (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
 def _clean_text(s: str) -> str:
-    return re.sub(r"\s+", " ", s).strip()
+    return _WS_RE.sub(" ", s).strip()
 
 def _guess_units_from_text(text: str) -> Optional[str]:
-    m = re.search(r"\((\d+\.\d{2})\)\s*$", text)
+    m = _UNITS_TAIL_RE.search(text)
     return m.group(1) if m else None
 
 def _is_heading(tag) -> bool:
     if not getattr(tag, "name", None):
         return False
-    if re.match(r"^h[1-6]$", tag.name, re.I):
+    if _HEADING_TAG_RE.match(tag.name):
         return True
     if tag.get("role", "").lower() == "heading":
         return True
@@ -41,7 +88,7 @@ def _is_heading(tag) -> bool:
     return "heading" in classes or "title" in classes
 
 def _heading_level(tag) -> int:
-    if getattr(tag, "name", None) and re.match(r"^h[1-6]$", tag.name, re.I):
+    if getattr(tag, "name", None) and _HEADING_TAG_RE.match(tag.name):
         return int(tag.name[1])
     if tag.get("aria-level"):
         try:
@@ -51,56 +98,13 @@ def _heading_level(tag) -> int:
     return 6  # treat as lowest priority if unknown
 
 def _looks_like_list_title(text: str) -> bool:
-    t = _clean_text(text).lower()
-    if not t:
-        return False
-    if t in {
-        "undergraduate communication requirement",
-        "communication requirement",
-        "natural science list",
-        "natural sciences list",
-        "technical electives list",
-        "technical electives",
-        "complementary studies electives",
-        "complementary studies elective list",
-        "additional requirements",
-        "additional requirement",
-    }:
-        return True
-    if re.search(r"\blist\s*[1-9]\b", t):
-        return True
-    if "list" in t and any(k in t for k in ["natural", "science", "technical", "elective", "complementary"]):
-        return True
-    return False
+    return _LIST_TITLE_RE.search(_clean_text(text).lower()) is not None
 
 def _is_requirements_bucket(text: str) -> bool:
     return _clean_text(text).lower() in {"course requirements", "course requirement"}
 
 def _is_course_list_title(t: str) -> bool:
-    tl = t.strip().lower()
-    if not tl:
-        return False
-    # allow-list typical list section names
-    allow_exact = {
-        "undergraduate communication requirement",
-        "communication requirement",
-        "natural science list",
-        "natural sciences list",
-        "technical electives list",
-        "technical electives",
-        "complementary studies electives",
-        "complementary studies elective list",
-        "additional requirements",  # (contains sustainability list)
-    }
-    if tl in allow_exact:
-        return True
-    # “List 1/2/3…”
-    if re.search(r"\blist\s*[1-9]\b", tl):
-        return True
-    # Generic “<something> list” with relevant keywords
-    if "list" in tl and any(k in tl for k in ["natural", "science", "technical", "elective", "complementary"]):
-        return True
-    return False
+    return _LIST_TITLE_RE.search(t.strip().lower()) is not None
 
 def _collect_until_next_heading(start_node, max_level: int) -> str:
     """Collect HTML from siblings after start_node until next heading of level <= max_level."""
@@ -131,25 +135,47 @@ def _course_nodes_in_container(container) -> List[Tuple[str, str, Optional[str]]
 def _extract_heading_text(tag) -> str:
     return _clean_text(tag.get_text(" ", strip=True))
 
+_TITLE_TRANS = str.maketrans({"–": "-", "—": "-"})
+
 def _standardize_list_title(t: str) -> str:
     # Normalize frequent variations so downstream matching is easier
-    t_norm = t.replace("  ", " ")
-    t_norm = t_norm.replace("–", "-").replace("—", "-")
-    return t_norm
+    return _WS_RE.sub(" ", t.translate(_TITLE_TRANS)).strip()
 
 def _unique(seq):
-    seen = set()
-    out = []
-    for x in seq:
-        if x not in seen:
-            seen.add(x)
-            out.append(x)
-    return out
+    # dict keys keep first-seen order
+    return list(dict.fromkeys(seq))
+
+def _is_course_json(j: Any) -> bool:
+    """True if a captured JSON payload looks like a Kuali course object."""
+    if not isinstance(j, dict):
+        return False
+    cand = j.get("data") if isinstance(j.get("data"), dict) else j
+    attrs = cand.get("attributes") if isinstance(cand.get("attributes"), dict) else cand
+    return any(k in attrs for k in ["title", "subjectCode", "number", "description"])
 
 # -------------------------
 # Browser tool (Playwright)
 # -------------------------
 
+# Requests aborted before they leave the browser: nothing we parse depends on them,
+# and they only delay networkidle. Kuali (the calendar API) is never blocked.
+_BLOCKED_RESOURCE_TYPES = frozenset(("image", "font", "media", "stylesheet"))
+_TRACKER_URL_RE = re.compile(r"googletagmanager|google-analytics|doubleclick|facebook|hotjar")
+
+def _route_filter(route) -> None:
+    req = route.request
+    url = req.url
+    if _TRACKER_URL_RE.search(url) or (
+        req.resource_type in _BLOCKED_RESOURCE_TYPES and "uwaterloocm.kuali.co" not in url
+    ):
+        route.abort()
+    else:
+        route.continue_()
+
+# Playwright handle + launched browsers, per thread: sync Playwright objects may only be
+# used from the thread that created them. Reused across BrowserFetchTool.forward() calls.
+_BROWSER_STATE = threading.local()
+
 class BrowserFetchTool(Tool):
     name = "browser_fetch"
     description = "Open a page with Playwright and return HTML plus captured JSON payloads."
@@ -174,20 +200,67 @@ class BrowserFetchTool(Tool):
             "description": "Run headless browser. Default True.",
             "nullable": True,
         },
+        "wait_for_kuali": {
+            "type": "boolean",
+            "description": "If true, stop waiting as soon as a course JSON payload is captured. Default False.",
+            "nullable": True,
+        },
     }
     output_type = "string"
 
+    @classmethod
+    def _get_browser(cls, headless: bool):
+        state = _BROWSER_STATE
+        if getattr(state, "pw", None) is None:
+            state.pw = sync_playwright().start()
+            state.browsers = {}
+        browser = state.browsers.get(headless)
+        if browser is None or not browser.is_connected():
+            browser = state.browsers[headless] = state.pw.chromium.launch(headless=headless)
+        return browser
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Close the calling thread's browsers and stop its Playwright driver."""
+        state = _BROWSER_STATE
+        if getattr(state, "pw", None) is None:
+            return
+        for browser in state.browsers.values():
+            try:
+                browser.close()
+            except Exception:
+                pass
+        try:
+            state.pw.stop()
+        except Exception:
+            pass
+        state.pw, state.browsers = None, {}
+
     def forward(
         self,
         url: str = None,
         max_wait_ms: int = 4000,
         kuali_only: bool = True,
         headless: bool = True,
+        wait_for_kuali: bool = False,
     ) -> str:
+        # For agent compatibility, return a JSON string.
+        return _json_dumps(self._fetch(url, max_wait_ms, kuali_only, headless, wait_for_kuali))
+
+    def _fetch(
+        self,
+        url: str,
+        max_wait_ms: int = 4000,
+        kuali_only: bool = True,
+        headless: bool = True,
+        wait_for_kuali: bool = False,
+    ) -> Dict[str, Any]:
+        """forward() without the JSON encoding: returns {"html", "json_blobs", "url"}."""
         if not url:
             raise ValueError("URL is required")
         blobs: List[Dict[str, Any]] = []
         html: str = ""
+        course_captured = threading.Event()
 
         def _resp_handler(resp):
             try:
@@ -198,14 +271,17 @@ class BrowserFetchTool(Tool):
                         try:
                             data = resp.json()
                             blobs.append({"url": u, "json": data})
+                            if wait_for_kuali and _is_course_json(data):
+                                course_captured.set()
                         except Exception:
                             pass
             except Exception:
                 pass
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=headless)
-            context = browser.new_context()
+        # The browser outlives this call; only the context (and its page) is per-fetch
+        context = self._get_browser(headless).new_context()
+        try:
+            context.route("**/*", _route_filter)
             page = context.new_page()
 
             page.on("response", _resp_handler)
@@ -216,8 +292,16 @@ class BrowserFetchTool(Tool):
                 # still proceed; SPA sometimes never reaches strict network idle due to analytics
                 pass
 
-            # Let the app settle & network calls fire
-            time.sleep(max_wait_ms / 1000.0)
+            if wait_for_kuali:
+                # Stop as soon as the course JSON is in. Response handlers only run while
+                # Playwright is pumping events, so wait in short wait_for_timeout() slices
+                # rather than blocking on the event.
+                deadline = time.monotonic() + max_wait_ms / 1000.0
+                while not course_captured.is_set() and time.monotonic() < deadline:
+                    page.wait_for_timeout(100)
+            else:
+                # Let the app settle & network calls fire
+                time.sleep(max_wait_ms / 1000.0)
 
             try:
                 html = page.content()
@@ -225,17 +309,173 @@ class BrowserFetchTool(Tool):
                 html = ""
 
             page.close()
+        finally:
             context.close()
-            browser.close()
 
-        result = {"html": html, "json_blobs": blobs, "url": url}
-        # For agent compatibility, return a JSON string.
-        return json.dumps(result, ensure_ascii=False)
+        return {"html": html, "json_blobs": blobs, "url": url}
+
+
+atexit.register(BrowserFetchTool.shutdown)
+
+def _shutdown_pool_browsers(pool, workers: int) -> None:
+    """Run BrowserFetchTool.shutdown on every worker thread of a ThreadPoolExecutor."""
+    barrier = threading.Barrier(workers)
 
+    def _close(_):
+        barrier.wait()  # each thread holds one task until all workers have one
+        BrowserFetchTool.shutdown()
+
+    list(pool.map(_close, range(workers)))
 
 # -------------------------
 # Program Lists scraper
 # -------------------------
+def _list_title_of(txt: str) -> Optional[str]:
+    """Standardized list title if txt looks like one (and is not the requirements bucket)."""
+    # txt is already _clean_text()-ed, so the title pattern runs on it directly
+    if txt and _LIST_TITLE_RE.search(txt.lower()) and not _is_requirements_bucket(txt):
+        return _standardize_list_title(txt)
+    return None
+
+_ROW_TAGS = frozenset(("li", "tr", "p", "div"))
+
+# Skipped before any text is gathered: code, markup-only and void elements. Every
+# other tag stays a title candidate, since calendar list titles are often plain divs.
+_NON_TITLE_TAGS = frozenset((
+    "head", "meta", "link", "script", "style", "noscript", "template",
+    "svg", "path", "g", "use", "img", "br", "hr", "input",
+))
+
+# Compiled once; evaluated in C against the lxml tree
+_TEXT_XPATH = etree.XPath(".//text()[not(ancestor::script or ancestor::style)]")
+
+def _lxml_text(el) -> str:
+    # Same text as bs4's get_text(" ", strip=True) once whitespace is collapsed
+    return _clean_text(" ".join(_TEXT_XPATH(el)))
+
+def _list_rows_lxml(html: str) -> Tuple[List[str], List[Tuple[str, str, str]]]:
+    """
+    Return (list titles in DOM order, [(list title, row text, href), ...]) for every
+    course anchor that has a preceding list title.
+    """
+    doc = lxml_html.document_fromstring(html)
+
+    # Scope parsing to the "Course Lists" section if present, so we don't
+    # accidentally treat headings in the main requirements summary
+    # (e.g., "Undergraduate Communication Requirement" above core SE terms)
+    # as list titles.
+    root, skip_root = doc, False
+    for h3 in doc.iter("h3"):
+        txt = _lxml_text(h3)
+        if txt and "course lists" in txt.lower():
+            parent = next((anc for anc in h3.iterancestors() if "noBreak" in (anc.get("class") or "").split()), None)
+            root, skip_root = (parent if parent is not None else h3.getparent()), True
+            break
+
+    # One walk in document order finds both titles and anchors: every element is a
+    # list-title candidate (any tag, not only <h*>), and each course anchor is assigned
+    # to the most recent title before it.
+    # start/end events keep a stack of open li/tr/p/div rows, so an anchor's row is the
+    # top of the stack (seeded with the nearest row above root) instead of a parent walk.
+    titles: List[str] = []
+    rows: List[Tuple[str, str, str]] = []
+    current_title = None
+    row_stack = [next(root.iterancestors(*_ROW_TAGS), None)]
+    row_texts: Dict[Any, str] = {}
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        tag = el.tag
+        if not isinstance(tag, str):  # comments, processing instructions
+            continue
+        if event == "end":
+            if tag in _ROW_TAGS:
+                row_stack.pop()
+            continue
+        # The scoped container itself is not a candidate; tags in _NON_TITLE_TAGS never hold a title
+        if not (skip_root and el is root) and tag not in _NON_TITLE_TAGS:
+            href = el.get("href") if tag == "a" else None
+            if href and "#/courses/view/" in href and current_title:
+                # Prefer the full row text around the anchor
+                row = row_stack[-1]
+                if row is None:
+                    text = ""
+                elif row in row_texts:
+                    text = row_texts[row]
+                else:
+                    text = row_texts[row] = _lxml_text(row)
+                rows.append((current_title, text or _lxml_text(el), href))
+            title = _list_title_of(_lxml_text(el))
+            if title:
+                titles.append(title)
+                current_title = title
+        if tag in _ROW_TAGS:
+            row_stack.append(el)
+    # Anchors with no preceding list title are skipped (likely core requirements)
+    return titles, rows
+
+def _list_rows_lexbor(html: str) -> Tuple[List[str], List[Tuple[str, str, str]]]:
+    """_list_rows_lxml on selectolax's Lexbor tree: one traverse() finds titles and anchors."""
+    tree = LexborHTMLParser(html)
+
+    root, skip_root = tree.root, False
+    for h3 in tree.css("h3"):
+        txt = _clean_text(h3.text(separator=" ", strip=True))
+        if txt and "course lists" in txt.lower():
+            parent = h3.parent
+            while parent is not None and "noBreak" not in (parent.attributes.get("class") or "").split():
+                parent = parent.parent
+            root, skip_root = (parent or h3.parent or h3), True
+            break
+    if root is None:
+        return [], []
+
+    titles: List[str] = []
+    rows: List[Tuple[str, str, str]] = []
+    current_title = None
+    # Anchors in one list share rows/parents: memoize parent -> row and row -> text
+    row_by_parent: Dict[int, Any] = {}
+    row_texts: Dict[int, str] = {}
+    for node in root.traverse():
+        if skip_root:  # find_all() semantics: the scoped container itself is not a candidate
+            skip_root = False
+            continue
+        # comments/doctype, and tags whose text is never a title
+        if node.tag.startswith("-") or node.tag in _NON_TITLE_TAGS:
+            continue
+        txt = _clean_text(node.text(separator=" ", strip=True))
+        if node.tag == "a" and current_title:
+            href = node.attributes.get("href") or ""
+            if "#/courses/view/" in href:
+                parent = node.parent
+                pid = parent.mem_id if parent is not None else 0
+                if pid in row_by_parent:
+                    row = row_by_parent[pid]
+                else:
+                    row = parent
+                    while row is not None and row.tag not in _ROW_TAGS:
+                        row = row.parent
+                    row_by_parent[pid] = row
+                if row is None:
+                    text = ""
+                elif row.mem_id in row_texts:
+                    text = row_texts[row.mem_id]
+                else:
+                    text = row_texts[row.mem_id] = _clean_text(row.text(separator=" ", strip=True))
+                rows.append((current_title, text or txt, href))
+        title = _list_title_of(txt)
+        if title:
+            titles.append(title)
+            current_title = title
+    return titles, rows
+
+@dataclass(slots=True)
+class CourseRow:
+    """One course entry of a program list; becomes a dict only in the returned JSON."""
+    course_id: str
+    code: str
+    title: Optional[str]
+    units: Optional[str]
+    href: str
+
 class ProgramListsScraper(Tool):
     name = "program_lists_scraper"
     description = (
@@ -249,72 +489,36 @@ class ProgramListsScraper(Tool):
     output_type = "string"
 
     def forward(self, html: str = None, base_url: str = "https://uwaterloo.ca") -> str:
+        return _json_dumps(self._process(html))
+
+    def _process(self, html: str) -> Dict[str, Any]:
+        """forward() without the JSON encoding."""
         if not html:
             raise ValueError("HTML content is required")
-        soup = BeautifulSoup(html, "lxml")
-
-        # Scope parsing to the "Course Lists" section if present, so we don't
-        # accidentally treat headings in the main requirements summary
-        # (e.g., "Undergraduate Communication Requirement" above core SE terms)
-        # as list titles.
-        root = soup
-        for h3 in soup.find_all("h3"):
-            txt = _clean_text(h3.get_text(" ", strip=True))
-            if txt and "course lists" in txt.lower():
-                parent = h3.find_parent(class_="noBreak") or h3.parent
-                root = parent or h3
-                break
-
-        # 1) Collect all potential list titles in DOM order (any tag, not only <h*>)
-        header_nodes = []
-        for tag in root.find_all(True):
-            # skip tiny tags to avoid noise
-            if not getattr(tag, "get_text", None):
-                continue
-            txt = _clean_text(tag.get_text(" ", strip=True))
-            if not txt:
-                continue
-            if _looks_like_list_title(txt) and not _is_requirements_bucket(txt):
-                header_nodes.append((tag, _standardize_list_title(txt)))
+        if LexborHTMLParser is not None:
+            titles, rows = _list_rows_lexbor(html)
+        else:
+            titles, rows = _list_rows_lxml(html)
 
         # If we found nothing, return empty early
-        if not header_nodes:
-            return json.dumps({"course_lists": {}}, ensure_ascii=False)
-
-        # 2) Collect all course anchors in DOM order (scoped to root)
-        anchors = root.select('a[href*="#/courses/view/"]')
+        if not titles:
+            return {"course_lists": {}}
 
-        lists_out: Dict[str, Dict[str, Any]] = {}
+        courses_by_list: Dict[str, List[CourseRow]] = {}
+        seen_ids: Dict[str, set] = {}
         # Pre-create list buckets with order preserved
-        for _, title in header_nodes:
-            if title not in lists_out:
-                lists_out[title] = {"list_name": title, "courses": []}
-
-        # 3) For each course anchor, assign it to the nearest preceding list title
-        # Build a fast set of header elements for identity checks
-        header_tags = [hn for hn, _ in header_nodes]
-        header_set = set(header_tags)
-
-        for a in anchors:
-            href = a.get("href", "")
-            if "#/courses/view/" not in href:
-                continue
+        for title in titles:
+            if title not in courses_by_list:
+                courses_by_list[title] = []
+                seen_ids[title] = set()
+
+        for assigned_title, text, href in rows:
             cid = href.split("#/courses/view/")[-1]
-            # Prefer the full row text around the anchor
-            row = a.find_parent(["li", "tr", "p", "div"]) or a
-            text = _clean_text(row.get_text(" ", strip=True)) or _clean_text(a.get_text(" ", strip=True))
-
-            # Find the closest *previous* header candidate in document order
-            assigned_title = None
-            for prev in a.previous_elements:
-                if prev in header_set:
-                    # map to the normalized title string
-                    idx = header_tags.index(prev)
-                    assigned_title = header_nodes[idx][1]
-                    break
-            if not assigned_title:
-                # no preceding list title → skip (likely belongs to core requirements)
+            # Dedup within a list by course_id while preserving first occurrence
+            seen = seen_ids[assigned_title]
+            if cid in seen:
                 continue
+            seen.add(cid)
 
             # Parse code/title/units from text
             units = _guess_units_from_text(text)
@@ -328,24 +532,19 @@ class ProgramListsScraper(Tool):
                 else:
                     code_part, title_part = text, ""
             code_part = _clean_text(code_part)
-            title_part = re.sub(r"\(\s*\d+\.\d{2}\s*\)\s*$", "", title_part).strip()
+            title_part = _UNITS_STRIP_RE.sub("", title_part).strip()
             m = COURSE_CODE_RE.search(code_part)
             code_std = f"{m.group(1)} {m.group(2)}" if m else code_part
 
-            # Dedup within a list by course_id while preserving first occurrence
-            bucket = lists_out[assigned_title]["courses"]
-            if not any(c["course_id"] == cid for c in bucket):
-                bucket.append({
-                    "course_id": cid,
-                    "code": code_std,
-                    "title": title_part or None,
-                    "units": units,
-                    "href": href,
-                })
+            courses_by_list[assigned_title].append(CourseRow(cid, code_std, title_part or None, units, href))
 
         # 4) Drop empty lists and return
-        lists_out = {k: v for k, v in lists_out.items() if v["courses"]}
-        return json.dumps({"course_lists": lists_out}, ensure_ascii=False)
+        lists_out = {
+            title: {"list_name": title, "courses": [asdict(c) for c in courses]}
+            for title, courses in courses_by_list.items()
+            if courses
+        }
+        return {"course_lists": lists_out}
 
 # -------------------------
 # Kuali JSON parsing for course pages
@@ -406,6 +605,16 @@ def _extract_course_fields_from_json(j: Dict[str, Any]) -> Dict[str, Any]:
 
     return out
 
+def _sibling_text(node) -> str:
+    """Visible text of an already-parsed sibling node; comments, scripts and styles give ''."""
+    if isinstance(node, Tag):
+        if node.name in ("script", "style", "template"):
+            return ""
+        return _clean_text(node.get_text(" ", strip=True))
+    if isinstance(node, PreformattedString):  # Comment, Doctype, CData, ...
+        return ""
+    return _clean_text(str(node))
+
 def _extract_reqs_from_dom(html: str) -> Dict[str, Optional[str]]:
     """
     Fallback if JSON didn’t expose requisites plainly: pull visible text blocks.
@@ -414,24 +623,20 @@ def _extract_reqs_from_dom(html: str) -> Dict[str, Optional[str]]:
     def grab(label: str) -> Optional[str]:
         lab = soup.find(lambda tag: tag.name in ["h3","h4","strong","b"] and _clean_text(tag.get_text()).lower()==label.lower())
         if not lab:
-            lab = soup.find(string=re.compile(rf"^{re.escape(label)}", re.I))
+            lab = soup.find(string=_REQ_LABEL_RES[label])
             if lab and lab.parent:
                 blk = _clean_text(lab.parent.get_text(" ", strip=True))
                 return blk
             return None
         txts = []
         for sib in lab.parent.next_siblings:
-            if getattr(sib, "name", None) and re.match(r"^h[1-4]$", sib.name, re.I):
+            if getattr(sib, "name", None) and _H1_4_RE.match(sib.name):
                 break
-            txts.append(_clean_text(BeautifulSoup(str(sib), "lxml").get_text(" ", strip=True)))
+            txts.append(_sibling_text(sib))
         joined = " ".join(t for t in txts if t).strip()
         return joined or None
 
-    return {
-        "prerequisites": grab("Prerequisites"),
-        "corequisites": grab("Corequisites"),
-        "antirequisites": grab("Antirequisites"),
-    }
+    return {label.lower(): grab(label) for label in _REQ_LABELS}
 
 class CourseDetailsScraper(Tool):
     name = "course_details_scraper"
@@ -448,7 +653,16 @@ class CourseDetailsScraper(Tool):
     def forward(self, browser_payload: str = None, list_membership: str = "") -> str:
         if not browser_payload:
             raise ValueError("Browser payload is required")
-        payload = json.loads(browser_payload)
+        lm = None
+        if list_membership:
+            try:
+                lm = _json_loads(list_membership)
+            except Exception:
+                pass
+        return _json_dumps(self._process(_json_loads(browser_payload), lm))
+
+    def _process(self, payload: Dict[str, Any], list_membership: Optional[Dict[str, Iterable[str]]] = None) -> Dict[str, Any]:
+        """forward() on an already-decoded payload and membership map; returns the details dict."""
         html = payload.get("html", "")
         blobs = payload.get("json_blobs", [])
 
@@ -456,11 +670,7 @@ class CourseDetailsScraper(Tool):
         course_json = None
         for b in blobs:
             j = b.get("json")
-            if not isinstance(j, dict):
-                continue
-            cand = j.get("data") if isinstance(j.get("data"), dict) else j
-            attrs = cand.get("attributes") if isinstance(cand.get("attributes"), dict) else cand
-            if any(k in attrs for k in ["title", "subjectCode", "number", "description"]):
+            if _is_course_json(j):
                 course_json = j
                 break
 
@@ -499,9 +709,9 @@ class CourseDetailsScraper(Tool):
             if desc_label:
                 parts = []
                 for sib in desc_label.parent.next_siblings:
-                    if getattr(sib, "name", None) and re.match(r"^h[1-4]$", sib.name, re.I):
+                    if getattr(sib, "name", None) and _H1_4_RE.match(sib.name):
                         break
-                    parts.append(_clean_text(BeautifulSoup(str(sib), "lxml").get_text(" ", strip=True)))
+                    parts.append(_sibling_text(sib))
                 out["description"] = " ".join(p for p in parts if p) or out["description"]
 
         # If requisites are missing, try DOM text
@@ -512,24 +722,27 @@ class CourseDetailsScraper(Tool):
                     out[k] = v
 
         # lists membership (optional input): {list_name: [course_id, ...], ...}
+        # Values may already be sets (see courses_from_program), which are used as-is
         if list_membership and out.get("course_id"):
             try:
-                lm = json.loads(list_membership)
                 cid = out["course_id"]
                 # preserve program list order (no alphabetical sort)
                 membership_seq = []
-                for lname, ids in lm.items():  # dict preserves insertion order
-                    try:
-                        idset = set(ids)
-                    except TypeError:
-                        idset = set(ids or [])
+                for lname, ids in list_membership.items():  # dict preserves insertion order
+                    if isinstance(ids, (set, frozenset)):
+                        idset = ids
+                    else:
+                        try:
+                            idset = set(ids)
+                        except TypeError:
+                            idset = set(ids or [])
                     if cid in idset:
                         membership_seq.append(lname)
                 out["lists"] = membership_seq
             except Exception:
                 pass
 
-        return json.dumps(out, ensure_ascii=False)
+        return out
 
 
 # -------------------------
@@ -541,22 +754,59 @@ def scrape_program_lists(program_url: str, headless: bool = True) -> Dict[str, A
     browser = BrowserFetchTool()
     lists_tool = ProgramListsScraper()
 
-    payload_str = browser.forward(url=program_url, headless=headless, max_wait_ms=4500, kuali_only=False)
-    payload = json.loads(payload_str)
-    html = payload["html"]
+    # Tools are called through their dict-level methods: no JSON round trip between them
+    payload = browser._fetch(program_url, headless=headless, max_wait_ms=4500, kuali_only=False)
+    return lists_tool._process(payload["html"])
 
-    lists_json_str = lists_tool.forward(html=html, base_url="https://uwaterloo.ca")
-    return json.loads(lists_json_str)
+class DiskCache:
+    """Browser payloads on disk (gzip'd, keyed by sha1 of the URL), expiring after ttl_days."""
 
-def scrape_course_details(course_url: str, list_membership: Optional[Dict[str, List[str]]] = None, headless: bool = True) -> Dict[str, Any]:
-    """Open a course URL and return full details dict. Optionally pass list_membership to tag list names."""
-    browser = BrowserFetchTool()
+    def __init__(self, root: Optional[Path] = None, ttl_days: float = 7.0):
+        self.root = root or Path.home() / ".cache" / "course-connect"
+        self.ttl_s = ttl_days * 86400
+
+    def _path(self, url: str) -> Path:
+        return self.root / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json.gz"
+
+    def get(self, url: str) -> Optional[str]:
+        path = self._path(url)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_s:
+                return None
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def put(self, url: str, payload_str: str) -> None:
+        path = self._path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write(payload_str)
+        os.replace(tmp, path)
+
+def scrape_course_details(
+    course_url: str,
+    list_membership: Optional[Dict[str, Iterable[str]]] = None,
+    headless: bool = True,
+    cache: Optional[DiskCache] = None,
+) -> Dict[str, Any]:
+    """Open a course URL and return full details dict. Optionally pass list_membership to tag list names.
+    With a cache, a fresh cached payload skips the browser; only fetches that captured course JSON are stored."""
     course_tool = CourseDetailsScraper()
 
-    payload_str = browser.forward(url=course_url, headless=headless, max_wait_ms=4500, kuali_only=True)
-    lm_str = json.dumps(list_membership) if list_membership else ""
-    result_str = course_tool.forward(browser_payload=payload_str, list_membership=lm_str)
-    return json.loads(result_str)
+    cached = cache.get(course_url) if cache is not None else None
+    if cached is not None:
+        payload = _json_loads(cached)
+    else:
+        browser = BrowserFetchTool()
+        payload = browser._fetch(course_url, headless=headless, max_wait_ms=4500, kuali_only=True, wait_for_kuali=True)
+    result = course_tool._process(payload, list_membership)
+    if cache is not None and cached is None and result.get("json_captured"):
+        cache.put(course_url, _json_dumps(payload))
+    return result
 
 # -------------------------
 # CLI
@@ -564,7 +814,7 @@ def scrape_course_details(course_url: str, list_membership: Optional[Dict[str, L
 
 if __name__ == "__main__":
     import argparse
-    from pathlib import Path
+    from concurrent.futures import ThreadPoolExecutor
 
     parser = argparse.ArgumentParser(description="Waterloo Academic Calendar scrapers (smolagents-style tools).")
     sub = parser.add_subparsers(dest="cmd", required=True)
@@ -584,6 +834,9 @@ if __name__ == "__main__":
     p3.add_argument("program_url")
     p3.add_argument("-o", "--out", default="courses_from_program.jsonl")
     p3.add_argument("--headful", action="store_true")
+    p3.add_argument("--workers", type=int, default=4, help="Course pages fetched concurrently (default: 4)")
+    p3.add_argument("--no-cache", action="store_true", help="Always re-fetch course pages (skip ~/.cache/course-connect)")
+    p3.add_argument("--cache-ttl-days", type=float, default=7.0, help="Reuse cached course pages up to this age (default: 7)")
 
     args = parser.parse_args()
 
@@ -596,7 +849,7 @@ if __name__ == "__main__":
         list_map = None
         if args.lists:
             try:
-                lists_data = json.loads(Path(args.lists).read_text())
+                lists_data = _json_loads(Path(args.lists).read_text())
                 # Build membership map: list_name -> [course_id,...]
                 lm = {}
                 for lname, block in (lists_data.get("course_lists") or {}).items():
@@ -635,16 +888,37 @@ if __name__ == "__main__":
         print(f"Found {len(ordered_pairs)} unique course IDs from Course Lists (ordered by first list).")
         out_path = Path(args.out)
 
-        with out_path.open("w", encoding="utf-8") as f:
-            for i, (first_list, cid) in enumerate(ordered_pairs, 1):
-                url = base + cid
-                try:
-                    d = scrape_course_details(url, list_membership=list_map, headless=not args.headful)
-                    # annotate the first_list that determined ordering
-                    d["first_list"] = first_list
-                    f.write(json.dumps(d, ensure_ascii=False) + "\n")
-                    print(f"[{i}/{len(ordered_pairs)}] {first_list} :: {d.get('code') or cid}  JSON={d.get('json_captured')}")
-                except Exception as e:
-                    print(f"[{i}/{len(ordered_pairs)}] {first_list} :: {cid} ERROR: {e}")
+        cache = None if args.no_cache else DiskCache(ttl_days=args.cache_ttl_days)
+        # Membership sets built once for all courses rather than once per course
+        list_id_sets = {lname: frozenset(ids) for lname, ids in list_map.items()}
+
+        def _fetch(pair: Tuple[str, str]) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+            try:
+                d = scrape_course_details(base + pair[1], list_membership=list_id_sets, headless=not args.headful, cache=cache)
+                return d, None
+            except Exception as e:
+                return None, e
+
+        # Each worker thread keeps its own Chromium (the sync Playwright API is per-thread), so
+        # pages load concurrently; map() yields in submission order, keeping the JSONL ordered.
+        workers = max(1, args.workers)
+        # Lines are written 16 at a time through a 64 KiB buffer and flushed per batch,
+        # so an interrupted run still leaves everything up to the last batch on disk
+        batch: List[str] = []
+        with out_path.open("w", encoding="utf-8", buffering=64 * 1024) as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            for i, ((first_list, cid), (d, err)) in enumerate(zip(ordered_pairs, pool.map(_fetch, ordered_pairs)), 1):
+                if err is not None:
+                    print(f"[{i}/{len(ordered_pairs)}] {first_list} :: {cid} ERROR: {err}")
+                    continue
+                # annotate the first_list that determined ordering
+                d["first_list"] = first_list
+                batch.append(_json_dumps(d) + "\n")
+                if len(batch) >= 16:
+                    f.write("".join(batch))
+                    f.flush()
+                    batch.clear()
+                print(f"[{i}/{len(ordered_pairs)}] {first_list} :: {d.get('code') or cid}  JSON={d.get('json_captured')}")
+            f.write("".join(batch))
+            _shutdown_pool_browsers(pool, workers)
 
         print(f"[OK] Wrote {len(ordered_pairs)} courses → {out_path}")
@@ -4,48 +4,98 @@
 # playwright install
 
 import asyncio
+import hashlib
+import html
 import json
+import os
 import re
+import sqlite3
 import sys
 import time
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple, Any
 
 from playwright.async_api import async_playwright
 
+try:
+    import orjson  # C extension; emits UTF-8 bytes directly
+except ImportError:
+    orjson = None
+
 PROGRAM_URL = "https://uwaterloo.ca/academic-calendar/undergraduate-studies/catalog#/programs/H1zle10Cs3?searchTerm=software%20engineering&bc=true&bcCurrent=Software%20Engineering%20(Bachelor%20of%20Software%20Engineering%20-%20Honours)&bcItemType=programs"
 COURSE_LINK_HREF_PART = "#/courses/view/"
+# Course lines are written in batches: every WRITE_BATCH_LINES lines or WRITE_INTERVAL_S seconds
+WRITE_BATCH_LINES = 16
+WRITE_INTERVAL_S = 1.0
+# Program-page link collection is cached per program URL for re-runs
+PROGRAM_LINKS_CACHE_DIR = Path.home() / ".cache" / "course-connect"
+PROGRAM_LINKS_TTL_S = 24 * 3600
+# Scraped courses are cached next to the output (<out>.cache.sqlite), keyed by course id
+COURSE_CACHE_TTL_S = 7 * 24 * 3600
+# Content anchors the SPA renders once its data has loaded
+COURSE_LINK_SELECTOR = 'a[href*="#/courses/view/"]'
 
 # ---- Helpers ---------------------------------------------------------------
 
 CODE_RE = re.compile(r"\b([A-Z]{2,5})\s*-?\s*(\d{2,3}[A-Z]?)\b")  # e.g., CS 241, MATH119, ECE 105A
-
+TAG_RE = re.compile(r"<[^>]+>")
+WHITESPACE_RE = re.compile(r"\s+")
+# Generic instruction headings ("Complete all of the following") that aren't list/term names
+BUCKET_SKIP_RE = re.compile(r"complete|following|choose|must|minimum|units?|credits?", re.I)
+COOKIE_BTN_RE = re.compile(r"accept|agree", re.I)
+KUALI_CID_RE = re.compile(r"courses/view/([a-f0-9]+)")
+# Requests that contribute nothing to the scraped text (XHR/fetch/document/script still load)
+BLOCKED_RESOURCE_TYPES = frozenset(("image", "font", "media", "stylesheet"))
+TRACKER_URL_RE = re.compile(r"analytics|googletagmanager|doubleclick|hotjar")
+
+@lru_cache(maxsize=4096)  # anchor/header texts repeat across lists
 def normalize_code(text: str) -> Optional[str]:
-    m = CODE_RE.search(text.replace("\xa0", " "))
+    if len(text) < 4:  # shortest code is "AB12"
+        return None
+    if "\xa0" in text:
+        text = text.replace("\xa0", " ")
+    m = CODE_RE.search(text)
     if not m:
         return None
     subj, num = m.group(1), m.group(2)
     return f"{subj} {num}"
 
-def uniq(seq):
-    seen = set()
-    for x in seq:
-        if x not in seen:
-            seen.add(x)
-            yield x
-
+@lru_cache(maxsize=4096)
 def clean_text(s: Optional[str]) -> Optional[str]:
     if not s:
         return None
-    s = re.sub(r"\s+", " ", s).strip()
+    s = WHITESPACE_RE.sub(" ", s).strip()
     return s or None
 
 def join_texts(texts: List[str]) -> Optional[str]:
     texts = [clean_text(t) for t in texts if clean_text(t)]
     return clean_text(" ".join(texts)) if texts else None
 
-@dataclass
+json_loads = orjson.loads if orjson is not None else json.loads
+
+def jsonl_line(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+def write_lines(f, lines: List[bytes]) -> None:
+    # One scatter-gather syscall for the whole batch (f is an unbuffered binary file)
+    if hasattr(os, "writev"):
+        written = os.writev(f.fileno(), lines)
+        if written < sum(map(len, lines)):
+            f.write(b"".join(lines)[written:])
+    else:
+        f.write(b"".join(lines))
+
+def html_to_text(s: Any) -> Optional[str]:
+    # Kuali JSON fields hold rich-text HTML fragments
+    if not isinstance(s, str):
+        return None
+    return clean_text(html.unescape(TAG_RE.sub(" ", s)))
+
+@dataclass(slots=True)
 class CourseResult:
     course_id: str                   # hash id from the href
     code: Optional[str]              # "CS 241"
@@ -59,6 +109,22 @@ class CourseResult:
     source_url: str
     json_captured: bool              # whether any Kuali JSON captured for this course (informational)
 
+    def to_dict(self) -> Dict[str, Any]:
+        # Flat dict literal; asdict() would deep-copy every field recursively
+        return {
+            "course_id": self.course_id,
+            "code": self.code,
+            "title": self.title,
+            "units": self.units,
+            "description": self.description,
+            "prerequisites": self.prerequisites,
+            "corequisites": self.corequisites,
+            "antirequisites": self.antirequisites,
+            "lists": self.lists,
+            "source_url": self.source_url,
+            "json_captured": self.json_captured,
+        }
+
 @dataclass
 class ProgramResult:
     program_url: str
@@ -73,63 +139,52 @@ class ProgramResult:
 # ---- DOM scraping utilities (run in the page) ------------------------------
 
 DOM_JS_COLLECT_LINKS = """
-(() => {
+() => {
   // Return all course links with their nearest headings context.
-  const anchors = Array.from(document.querySelectorAll('a[href*="#/courses/view/"]'));
-  const isHeading = (el) => !!el && /^(H1|H2|H3|H4|H5|H6)$/i.test(el.tagName);
-
-  function nearestHeadings(el) {
-    // Walk up the DOM looking for the closest preceding Hn (local) and the nearest higher-level section heading above it.
-    // We'll collect up to two: localHeading (closest Hn above), and sectionHeading (a higher Hn before that).
-    let local = null;
-    let section = null;
-
-    // climb to a block container so we can look backwards
-    let node = el;
-    while (node && node.previousElementSibling == null) node = node.parentElement;
-
-    // Search backwards for a heading; if none on this level, climb and continue
-    function findPrevHeading(start) {
-      let n = start;
-      while (n) {
-        // scan previous siblings
-        let p = n.previousElementSibling;
-        while (p) {
-          if (isHeading(p)) return p;
-          // also check if this sibling contains headings somewhere inside (e.g., lists wrapped in sections)
-          const h = p.querySelector && p.querySelector('h1,h2,h3,h4,h5,h6');
-          if (h) return h;
-          p = p.previousElementSibling;
-        }
-        // climb
-        n = n.parentElement;
-      }
-      return null;
-    }
-
-    const first = findPrevHeading(el);
-    if (first) {
-      local = first.textContent.trim();
-      // find an earlier higher heading (by going before `first`)
-      const container = first.parentElement;
-      if (container) {
-        const beforeFirst = findPrevHeading(container);
-        if (beforeFirst) section = beforeFirst.textContent.trim();
-      }
+  // One query walks headings and course anchors together in document order, keeping the
+  // latest heading text per level (H1-H6): an anchor's local heading is the most recent
+  // heading before it, and its section heading the most recent one at a higher level.
+  const nodes = document.querySelectorAll('h1,h2,h3,h4,h5,h6,a[href*="#/courses/view/"]');
+  const byLevel = [null, null, null, null, null, null, null];
+  let lastLevel = 0;
+  const out = [];
+
+  for (const el of nodes) {
+    const m = /^H([1-6])$/.exec(el.tagName);
+    if (m) {
+      const level = +m[1];
+      byLevel[level] = el.textContent.trim();
+      for (let l = level + 1; l <= 6; l++) byLevel[l] = null;
+      lastLevel = level;
+      continue;
     }
-    return { localHeading: local, sectionHeading: section };
+    let section = null;
+    for (let l = lastLevel - 1; l >= 1 && section === null; l--) section = byLevel[l];
+    out.push({
+      href: el.getAttribute('href') || '',
+      text: (el.textContent || '').trim(),
+      localHeading: byLevel[lastLevel] || null,
+      sectionHeading: section || null,
+    });
   }
+  return out;
+}
+"""
 
-  return anchors.map(a => {
-    const ctx = nearestHeadings(a);
-    return {
-      href: a.getAttribute('href') || '',
-      text: (a.textContent || '').trim(),
-      localHeading: ctx.localHeading || null,
-      sectionHeading: ctx.sectionHeading || null,
-    };
-  });
-})();
+DOM_JS_COURSE_READY = r"""
+() => {
+  // Course heading ("<CODE> - <Title>") rendered and the course block hydrated
+  const h = document.querySelector('h1, h2');
+  return !!h && /[A-Z]{2,5}\s*\d/.test(h.textContent) && document.body.textContent.toLowerCase().includes('units');
+}
+"""
+
+DOM_JS_SCROLL_AND_COUNT_LINKS = """
+() => {
+  // Jump to the bottom (triggers any lazy rendering) and report how many course links exist
+  window.scrollTo(0, document.body.scrollHeight);
+  return document.querySelectorAll('a[href*="#/courses/view/"]').length;
+}
 """
 
 DOM_JS_GET_MAIN_CONTENT_TEXT = """
@@ -145,60 +200,71 @@ DOM_JS_GET_MAIN_CONTENT_TEXT = """
 # We are removing DOM_JS_READ_SECTION as its functionality will be handled in Python
 
 DOM_JS_COLLECT_PROGRAM_REQUIREMENTS = r"""
-(() => {
+() => {
     const programData = {
         required_by_term: {},
         elective_requirements_by_term: {},
         course_lists: {}
     };
 
+    // Compiled once per evaluate instead of per link/item
+    const CODE_RE = /([A-Z]{2,5})\s*-?\s*(\d{2,3}[A-Z]?)/;
+    const CREDITS_RE = /\s*\([0-9.]+\)/;
+    const DASH_RE = /^[\s\-–—]*/;
+    const SPACE_RE = /\s+/g;
+    const ELECT_RE = /Complete (?:a total of )?(\d+) approved electives?/;
+    const COURSE_LINK = 'a[href*="#/courses/view/"]';
+    const ITEM_LINKS = `:scope > span > ${COURSE_LINK}`;
+
+    const genericElective = (title) => ({
+        code: `ELECTIVE_GENERIC_${Date.now()}_${Math.random().toString(36).substring(2, 7)}`,
+        title
+    });
+
     const extractCoursesFromList = (listElement) => {
         const courses = [];
-        const courseLinks = Array.from(listElement.querySelectorAll('li > span > a[href*="#/courses/view/"]'));
-        for (const link of courseLinks) {
-            const textContent = link.textContent.trim();
-            const codeMatch = textContent.match(/([A-Z]{2,5})\\s*-?\\s*(\\d{2,3}[A-Z]?)/);
-            if (codeMatch) {
-                const fullCode = `${codeMatch[1]} ${codeMatch[2]}`.replace(/\\s+/g, ''); // Remove space for consistent code format
-                let title = textContent.replace(codeMatch[0], '').trim();
-                // Remove credits part if present, e.g., " - Programming Principles (0.50)" -> " - Programming Principles"
-                title = title.replace(/\\s*\\([0-9.]+\\)/, '').replace(/^[\\s-–—]*/, '').trim();
-                if (title === '' && link.parentNode) {
-                    // Fallback to parent text if title is still empty, removing code and credits
-                    const parentText = link.parentNode.textContent.trim();
-                    title = parentText.replace(codeMatch[0], '').replace(/\\s*\\([0-9.]+\\)/, '').replace(/^[\\s-–—]*/, '').trim();
+        // Generic elective placeholders go after every linked course, as before
+        const electives = [];
+        // One pass over the list items: course links first, else "approved elective" text
+        for (const item of listElement.querySelectorAll('li')) {
+            const links = item.querySelectorAll(ITEM_LINKS);
+            for (const link of links) {
+                const textContent = link.textContent.trim();
+                const codeMatch = textContent.match(CODE_RE);
+                if (codeMatch) {
+                    const fullCode = `${codeMatch[1]} ${codeMatch[2]}`.replace(SPACE_RE, ''); // Remove space for consistent code format
+                    let title = textContent.replace(codeMatch[0], '').trim();
+                    // Remove credits part if present, e.g., " - Programming Principles (0.50)" -> " - Programming Principles"
+                    title = title.replace(CREDITS_RE, '').replace(DASH_RE, '').trim();
+                    if (title === '' && link.parentNode) {
+                        // Fallback to parent text if title is still empty, removing code and credits
+                        const parentText = link.parentNode.textContent.trim();
+                        title = parentText.replace(codeMatch[0], '').replace(CREDITS_RE, '').replace(DASH_RE, '').trim();
+                    }
+                    courses.push({
+                        code: fullCode,
+                        title: title || "Unknown Title" // Ensure title is never empty
+                    });
                 }
-                courses.push({
-                    code: fullCode,
-                    title: title || "Unknown Title" // Ensure title is never empty
-                });
-            } 
-        }
+            }
+            if (links.length > 0) continue;
 
-        // Handle generic elective placeholders if no specific course links were found in this list
-        const genericElectiveItems = Array.from(listElement.querySelectorAll('li'));
-        for (const item of genericElectiveItems) {
-            if (item.textContent.includes('approved elective') && !item.querySelector('a[href*="#/courses/view/"]')) {
-                const electiveText = item.textContent.trim();
-                const numElectivesMatch = electiveText.match(/Complete (?:a total of )?(\\d+) approved electives?/);
+            // Handle generic elective placeholders on items without a course link
+            const electiveText = item.textContent.trim();
+            if (electiveText.includes('approved elective') && !item.querySelector(COURSE_LINK)) {
+                const numElectivesMatch = electiveText.match(ELECT_RE);
                 if (numElectivesMatch) {
                     const num = parseInt(numElectivesMatch[1]);
                     for (let i = 0; i < num; i++) {
-                        courses.push({
-                            code: `ELECTIVE_GENERIC_${Date.now()}_${Math.random().toString(36).substring(2, 7)}`,
-                            title: `Approved Elective ${i + 1}`
-                        });
+                        electives.push(genericElective(`Approved Elective ${i + 1}`));
                     }
-                } else if (electiveText.includes('approved elective')) {
-                    courses.push({
-                        code: `ELECTIVE_GENERIC_${Date.now()}_${Math.random().toString(36).substring(2, 7)}`,
-                        title: `Approved Elective`
-                    });
+                } else {
+                    electives.push(genericElective(`Approved Elective`));
                 }
             }
         }
 
-        return courses;
+        return courses.concat(electives);
     };
 
     // Extract term-based requirements
@@ -272,7 +338,13 @@ DOM_JS_COLLECT_PROGRAM_REQUIREMENTS = r"""
     if (courseListsSection) {
         const rulesWrapper = courseListsSection.closest('.noBreak').querySelector('.rules-wrapper');
         if (rulesWrapper) {
-            const topLevelSections = Array.from(rulesWrapper.querySelectorAll('section'));
+            // querySelectorAll('section') matches every depth, so keep only the outermost
+            // sections here; their nested ones are handled below, each exactly once.
+            // (These sections sit under wrapper divs, so ':scope > section' would find none.)
+            const topLevelSections = Array.from(rulesWrapper.querySelectorAll('section')).filter(sec => {
+                const outer = sec.parentElement && sec.parentElement.closest('section');
+                return !outer || !rulesWrapper.contains(outer);
+            });
             for (const topSection of topLevelSections) {
                 const topHeaderSpan = topSection.querySelector('.style__itemHeaderH2___2f-ov > span');
                 if (topHeaderSpan) {
@@ -305,59 +377,113 @@ DOM_JS_COLLECT_PROGRAM_REQUIREMENTS = r"""
     }
 
     return programData;
-})();
+}
 """
 
-DOM_JS_READ_UNITS = r"""
+DOM_JS_READ_COURSE = r"""
 () => {
+  // Everything scrape_course needs from a rendered course page, in one round-trip.
+  const text = (el) => el ? (el.innerText || el.textContent || '').trim() : null;
+
+  // One query, in document order, serves the header and section lookups below
+  const nodes = Array.from(document.querySelectorAll('h1,h2,h3,h4,h5,h6'));
+  const isHeading = (el) => /^H[1-6]$/.test(el.tagName);
+
+  // Top page header (often "<CODE> - <Title>"), plus the first h2 as a title fallback
+  const header = text(nodes.find(el => el.tagName === 'H1' || el.tagName === 'H2'));
+  const h2 = text(nodes.find(el => el.tagName === 'H2'));
+
   // Units often appear as a small "Units" block or within a nearby section.
   // Try to find an element labeled "Units" then grab the next text.
-  const labels = Array.from(document.querySelectorAll('h1,h2,h3,dt,strong,span'));
-  let units = null;
-
   function grabNextText(node) {
     // Find closest following text-y node
     let n = node.nextElementSibling;
     while (n) {
-      const t = (n.innerText || n.textContent || '').trim();
+      const t = text(n);
       if (t) return t;
       n = n.nextElementSibling;
     }
     return null;
   }
 
-  for (const el of labels) {
-    const txt = (el.textContent || '').trim().toLowerCase();
-    if (txt === "units") {
-      units = grabNextText(el);
+  let units = null;
+  // Kuali renders course info as <dt>Units</dt><dd>0.50</dd>
+  for (const dt of document.querySelectorAll('dt')) {
+    if ((dt.textContent || '').trim().toLowerCase() === 'units') {
+      units = grabNextText(dt);
       if (units) break;
     }
   }
+  if (!units) {
+    // Other label markup: XPath matches "Units" labels natively instead of a JS scan of every span
+    const labels = document.evaluate(
+      "//*[self::h1 or self::h2 or self::h3 or self::strong or self::span]" +
+      "[translate(normalize-space(.), 'UNITS', 'units') = 'units']",
+      document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (let i = 0; i < labels.snapshotLength && !units; i++) {
+      units = grabNextText(labels.snapshotItem(i));
+    }
+  }
   if (!units) {
     // fallback: scan for a line like "Units\n0.50"
     const all = (document.body.innerText || '').split('\n').map(s => s.trim());
     for (let i = 0; i < all.length - 1; i++) {
-      if (all[i].toLowerCase() === 'units' && all[i+1]) return all[i+1];
+      if (all[i].toLowerCase() === 'units' && all[i+1]) { units = all[i+1]; break; }
     }
   }
-  return units;
-}
-"""
 
-DOM_JS_READ_HEADER = r"""
-() => {
-  // Return top page header (often "<CODE> - <Title>")
-  const h = document.querySelector('h1, h2');
-  return h ? (h.innerText || h.textContent || '').trim() : null;
+  // Labelled sections: one pass over the headings, collecting each wanted section's
+  // following siblings up to the next heading of the same or a higher level
+  const wanted = new Set(['description', 'prerequisites', 'corequisites', 'antirequisites']);
+  const sections = {};
+  for (const h of nodes) {
+    if (!isHeading(h)) continue;
+    const key = (h.textContent || '').trim().toLowerCase();
+    if (!wanted.has(key) || key in sections) continue;
+    const level = +h.tagName[1];
+    const parts = [];
+    for (let n = h.nextElementSibling; n; n = n.nextElementSibling) {
+      if (isHeading(n) && +n.tagName[1] <= level) break;
+      const t = text(n);
+      if (t) parts.push(t);
+    }
+    sections[key] = parts.length ? parts.join(' ') : null;
+  }
+
+  return { header, h2, units, sections };
 }
 """
 
+# The helpers above are registered once per document with context.add_init_script, so each
+# call sends a short "window.__scraper.<name>()" instead of re-shipping and re-parsing the source
+SCRAPER_INIT_JS = "window.__scraper = {\n" + ",\n".join(
+    f"  {name}: {src.strip()}" for name, src in (
+        ("collectLinks", DOM_JS_COLLECT_LINKS),
+        ("courseReady", DOM_JS_COURSE_READY),
+        ("scrollAndCountLinks", DOM_JS_SCROLL_AND_COUNT_LINKS),
+        ("collectProgramRequirements", DOM_JS_COLLECT_PROGRAM_REQUIREMENTS),
+        ("readCourse", DOM_JS_READ_COURSE),
+    )
+) + "\n};\n"
+JS_COLLECT_LINKS = "() => window.__scraper.collectLinks()"
+JS_COURSE_READY = "() => !!window.__scraper && window.__scraper.courseReady()"
+JS_SCROLL_AND_COUNT_LINKS = "() => window.__scraper.scrollAndCountLinks()"
+JS_COLLECT_PROGRAM_REQUIREMENTS = "() => window.__scraper.collectProgramRequirements()"
+JS_READ_COURSE = "() => window.__scraper.readCourse()"
+
 # ---- Core scraping ----------------------------------------------------------
 
+async def block_heavy_resources(route):
+    req = route.request
+    if req.resource_type in BLOCKED_RESOURCE_TYPES or TRACKER_URL_RE.search(req.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
 async def accept_cookies_if_present(page):
     # Click buttons that look like cookie acceptors
     try:
-        btn = await page.get_by_role("button", name=re.compile(r"accept|agree", re.I)).first
+        btn = await page.get_by_role("button", name=COOKIE_BTN_RE).first
         if await btn.is_visible(timeout=2000):
             await btn.click()
     except Exception:
@@ -368,17 +494,30 @@ async def accept_cookies_if_present(page):
     except Exception:
         pass
 
-async def wait_for_spa(page, *, heavy: bool = False):
-    # Wait for the React app to settle; 'networkidle' helps SPA fetches.
-    try:
-        await page.wait_for_load_state("domcontentloaded", timeout=15000)
-    except Exception:
-        pass
-    # Give the router time
+async def wait_for_spa(page, *, ready_selector: Optional[str] = None, timeout: int = 15000):
+    # Wait for the React app to render a known content anchor. Kuali keeps background
+    # polling open, so 'networkidle' would burn its full timeout after content is ready.
     try:
-        await page.wait_for_load_state("networkidle", timeout=15000 if heavy else 8000)
+        await page.wait_for_load_state("domcontentloaded", timeout=timeout)
     except Exception:
         pass
+    if ready_selector:
+        try:
+            await page.wait_for_selector(ready_selector, timeout=timeout)
+        except Exception:
+            pass
+
+async def scroll_until_links_stable(page, *, interval_ms: int = 200, max_rounds: int = 10):
+    prev = None
+    for _ in range(max_rounds):
+        try:
+            count = await page.evaluate(JS_SCROLL_AND_COUNT_LINKS)
+        except Exception:
+            return
+        if count == prev:
+            return
+        prev = count
+        await page.wait_for_timeout(interval_ms)
 
 async def collect_program_courses(page) -> Tuple[List[Tuple[str, str]], Dict[str, Set[str]]]:
     """
@@ -387,25 +526,27 @@ async def collect_program_courses(page) -> Tuple[List[Tuple[str, str]], Dict[str
       - membership: mapping "CS 241" -> set(["1B Term", "List 1", ...])
     """
     # ensure content visible
-    await wait_for_spa(page, heavy=True)
+    await wait_for_spa(page, ready_selector=COURSE_LINK_SELECTOR)
 
-    # sometimes the app lazy-renders on scroll; scroll a bit
-    for _ in range(3):
-        await page.mouse.wheel(0, 1200)
-        await asyncio.sleep(0.3)
+    # sometimes the app lazy-renders on scroll; scroll to the bottom until the link count is stable
+    await scroll_until_links_stable(page)
 
-    links = await page.evaluate(DOM_JS_COLLECT_LINKS)
+    links = await page.evaluate(JS_COLLECT_LINKS)
     membership: Dict[str, Set[str]] = {}
     course_refs: List[Tuple[str, str]] = []
+    seen_cids: Set[str] = set()
 
     for li in links:
         href = li.get("href") or ""
         text = li.get("text") or ""
         if COURSE_LINK_HREF_PART not in href:
             continue
-        # Hash route -> absolute url for convenience
-        url = "https://uwaterloo.ca/academic-calendar/undergraduate-studies/catalog" + href
         cid = href.split("/view/")[-1].strip()
+        # A course linked from several lists keeps its first (cid, url); later links only add buckets
+        if cid not in seen_cids:
+            seen_cids.add(cid)
+            # Hash route -> absolute url for convenience
+            course_refs.append((cid, "https://uwaterloo.ca/academic-calendar/undergraduate-studies/catalog" + href))
         code = normalize_code(text) or normalize_code(li.get("localHeading") or "") or None
 
         # Infer list/term name from nearest headings
@@ -418,18 +559,20 @@ async def collect_program_courses(page) -> Tuple[List[Tuple[str, str]], Dict[str
             membership.setdefault(code, set())
             if bucket:
                 # simplify bucket names like "Complete all of the following" -> ignore
-                if not re.search(r"complete|following|choose|must|minimum|units?|credits?", bucket, re.I):
+                if not BUCKET_SKIP_RE.search(bucket):
                     membership[code].add(bucket.strip())
 
-        course_refs.append((cid, url))
-
-    # dedupe preserving order
-    course_refs = list(uniq(course_refs))
     return course_refs, membership
 
-async def scrape_program_details(page, program_url: str, json_seen_flag: Dict[str, bool], debug_html_out: Optional[Path] = None) -> ProgramResult:
+async def scrape_program_details(page, program_url: str, json_seen_flag: Dict[str, bool], debug_html_out: Optional[Path] = None,
+                                 collect_links: bool = True) -> Tuple[ProgramResult, List[Tuple[str, str]], Dict[str, Set[str]]]:
+    """
+    One visit to the program page: program details, plus (when collect_links) the
+    course refs and membership from collect_program_courses; otherwise those are empty.
+    """
     await page.goto(program_url, wait_until="domcontentloaded")
-    await wait_for_spa(page, heavy=True)
+    await accept_cookies_if_present(page)
+    await wait_for_spa(page, ready_selector=COURSE_LINK_SELECTOR)
 
     # Capture outerHTML of the main content area after SPA has rendered
     html_content = await page.evaluate("document.querySelector('main#kuali-catalog-main')?.outerHTML || document.body.outerHTML")
@@ -446,7 +589,7 @@ async def scrape_program_details(page, program_url: str, json_seen_flag: Dict[st
     description = clean_text(description_el)
 
     # Get the structured program requirements directly
-    program_structured_data = await page.evaluate(DOM_JS_COLLECT_PROGRAM_REQUIREMENTS)
+    program_structured_data = await page.evaluate(JS_COLLECT_PROGRAM_REQUIREMENTS)
 
     # Create result with HTML included for fallback parsing
     result = ProgramResult(
@@ -462,25 +605,21 @@ async def scrape_program_details(page, program_url: str, json_seen_flag: Dict[st
     
     # Attach raw HTML to result object for later serialization
     result.raw_program_html = html_content
+
+    # Course links come from the same rendered page; no second navigation needed
+    if collect_links:
+        course_refs, membership = await collect_program_courses(page)
+    else:
+        course_refs, membership = [], {}
     
-    return result
+    return result, course_refs, membership
 
 async def read_section_text(page, title: str) -> Optional[str]:
     # This function is no longer needed as we are getting raw text and parsing in Python
     # Re-enabling for description, but it will likely return None since text is not extracted like this anymore.
         return None
 
-async def read_units(page) -> Optional[str]:
-    try:
-        return clean_text(await page.evaluate(DOM_JS_READ_UNITS))
-    except Exception:
-        return None
-
-async def read_header(page) -> Tuple[Optional[str], Optional[str]]:
-    try:
-        header = await page.evaluate(DOM_JS_READ_HEADER)
-    except Exception:
-        header = None
+def parse_header(header: Optional[str], h2: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
     header = header or ""
     code = normalize_code(header)
     title = None
@@ -494,43 +633,43 @@ async def read_header(page) -> Tuple[Optional[str], Optional[str]]:
             title = clean_text(header.replace(code, "", 1).lstrip(" -–—"))
     else:
         # try grabbing a second-level heading for title if present
-        try:
-            h2 = await page.locator("h2").first.inner_text()
-            title = clean_text(h2)
-        except Exception:
-            pass
+        title = clean_text(h2)
     return code, title
 
 async def open_course_page(page, url: str):
     await page.goto(url, wait_until="domcontentloaded")
-    await wait_for_spa(page, heavy=True)
-    # Ensure course heading is present
+    # One wait that returns as soon as the course heading and block are rendered
+    # (textContent, not innerText, so polling never forces a layout)
     try:
-        await page.get_by_role("heading", name=re.compile(r"[A-Z]{2,5}\s*\d{2,3}")).wait_for(timeout=8000)
+        await page.wait_for_function(JS_COURSE_READY, polling=100, timeout=8000)
     except Exception:
         pass
 
-async def scrape_course(page, cid: str, url: str, buckets_for_course: Set[str], json_seen_flag: Dict[str, bool], json_data_by_course_id: Dict[str, Dict[str, Any]]) -> CourseResult:
+def course_lists(code: Optional[str], buckets_by_code: Dict[str, Set[str]]) -> List[str]:
+    # Lists/terms learned from the program page, resolved once the course code is known
+    buckets = buckets_by_code.get(code) if code else None
+    return sorted(buckets) if buckets else []
+
+async def scrape_course(page, cid: str, url: str, buckets_by_code: Dict[str, Set[str]], json_seen_flag: Dict[str, bool], json_data_by_course_id: Dict[str, Dict[str, Any]]) -> CourseResult:
     await open_course_page(page, url)
 
-    code, title = await read_header(page)
-    units = await read_units(page)
-    description = await read_section_text(page, "Description")
-    prerequisites = await read_section_text(page, "Prerequisites")
-    corequisites = await read_section_text(page, "Corequisites")
-    antirequisites = await read_section_text(page, "Antirequisites")
+    # Header, units and sections come back from a single page.evaluate
+    try:
+        data = await page.evaluate(JS_READ_COURSE) or {}
+    except Exception:
+        data = {}
+    code, title = parse_header(data.get("header"), data.get("h2"))
+    units = clean_text(data.get("units"))
+    sections = data.get("sections") or {}
+    description = clean_text(sections.get("description"))
+    prerequisites = clean_text(sections.get("prerequisites"))
+    corequisites = clean_text(sections.get("corequisites"))
+    antirequisites = clean_text(sections.get("antirequisites"))
     
     # Try to extract units from JSON if DOM extraction failed
     if not units and cid in json_data_by_course_id:
         try:
-            json_data = json_data_by_course_id[cid]
-            data = json_data.get("data") or json_data
-            attributes = data.get("attributes") or data
-            credits = attributes.get("credits") or attributes.get("units")
-            if isinstance(credits, dict):
-                units = str(credits.get("min") or credits.get("max") or "")
-            elif credits:
-                units = str(credits)
+            units = units_from_json(json_attributes(json_data_by_course_id[cid]))
         except Exception:
             pass
 
@@ -543,131 +682,313 @@ async def scrape_course(page, cid: str, url: str, buckets_for_course: Set[str],
         prerequisites=prerequisites,
         corequisites=corequisites,
         antirequisites=antirequisites,
-        lists=sorted(list(buckets_for_course)) if buckets_for_course else [],
+        lists=course_lists(code, buckets_by_code),
         source_url=url,
         json_captured=bool(json_seen_flag.get(cid, False)),
     )
 
+# ---- Kuali JSON API ----------------------------------------------------------
+
+def json_attributes(json_data: Dict[str, Any]) -> Dict[str, Any]:
+    data = json_data.get("data") or json_data
+    return data.get("attributes") or data
+
+def units_from_json(attributes: Dict[str, Any]) -> Optional[str]:
+    credits = attributes.get("credits") or attributes.get("units")
+    if isinstance(credits, dict):
+        return str(credits.get("value") or credits.get("min") or credits.get("max") or "") or None
+    return str(credits) if credits else None
+
+def requisite_from_json(attributes: Dict[str, Any], name: str) -> Optional[str]:
+    # Either a top-level field or an entry of a "requisites" mapping
+    value = attributes.get(name)
+    requisites = attributes.get("requisites")
+    if value is None and isinstance(requisites, dict):
+        value = requisites.get(name)
+    return html_to_text(value)
+
+def course_from_json(cid: str, url: str, json_data: Dict[str, Any], buckets_by_code: Dict[str, Set[str]]) -> Optional[CourseResult]:
+    """Build a CourseResult from a Kuali course payload; None if it doesn't look like one."""
+    attributes = json_attributes(json_data)
+    subject = attributes.get("subjectCode")
+    if isinstance(subject, dict):
+        subject = subject.get("name")
+    code = normalize_code(f"{subject or ''} {attributes.get('catalogNumber') or ''}") \
+        or normalize_code(str(attributes.get("__catalogCourseId") or attributes.get("code") or ""))
+    if not code:
+        return None
+    return CourseResult(
+        course_id=cid,
+        code=code,
+        title=clean_text(attributes.get("title")),
+        units=units_from_json(attributes),
+        description=html_to_text(attributes.get("description")),
+        prerequisites=requisite_from_json(attributes, "prerequisites"),
+        corequisites=requisite_from_json(attributes, "corequisites"),
+        antirequisites=requisite_from_json(attributes, "antirequisites"),
+        lists=course_lists(code, buckets_by_code),
+        source_url=url,
+        json_captured=True,
+    )
+
+async def fetch_course_json(context, cid: str, url: str, api_template: Tuple[str, str], buckets_by_code: Dict[str, Set[str]]) -> Optional[CourseResult]:
+    # APIRequestContext shares the browser context's cookies; no page render needed
+    try:
+        resp = await context.request.get(api_template[0] + cid + api_template[1])
+        if not resp.ok:
+            return None
+        json_data = json_loads(await resp.body())
+        return course_from_json(cid, url, json_data, buckets_by_code) if isinstance(json_data, dict) else None
+    except Exception:
+        return None
+
+# ---- Program link cache ------------------------------------------------------
+
+def program_links_cache_path(program_url: str) -> Path:
+    return PROGRAM_LINKS_CACHE_DIR / f"program_{hashlib.md5(program_url.encode('utf-8')).hexdigest()}.json"
+
+def load_program_links(program_url: str) -> Optional[Tuple[List[Tuple[str, str]], Dict[str, Set[str]]]]:
+    path = program_links_cache_path(program_url)
+    try:
+        if time.time() - path.stat().st_mtime > PROGRAM_LINKS_TTL_S:
+            return None
+        data = json_loads(path.read_bytes())
+        course_refs = [(cid, url) for cid, url in data["course_refs"]]
+        membership = {code: set(buckets) for code, buckets in data["membership"].items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return course_refs, membership
+
+def save_program_links(program_url: str, course_refs: List[Tuple[str, str]], membership: Dict[str, Set[str]]) -> None:
+    path = program_links_cache_path(program_url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "program_url": program_url,
+        "course_refs": course_refs,
+        "membership": {code: sorted(buckets) for code, buckets in membership.items()},
+    }
+    # Write then rename so an interrupted run never leaves a partial cache file
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(jsonl_line(data))
+    os.replace(tmp, path)
+
+# ---- Course cache -------------------------------------------------------------
+
+def open_course_cache(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS course (course_id TEXT PRIMARY KEY, fetched_at REAL NOT NULL, payload BLOB NOT NULL)")
+    return conn
+
+def cached_course(conn: sqlite3.Connection, cid: str, buckets_by_code: Dict[str, Set[str]]) -> Optional[CourseResult]:
+    row = conn.execute(
+        "SELECT payload FROM course WHERE course_id = ? AND fetched_at > ?", (cid, time.time() - COURSE_CACHE_TTL_S)
+    ).fetchone()
+    if row is None:
+        return None
+    try:
+        result = CourseResult(**json_loads(row[0]))
+    except (ValueError, TypeError):
+        return None
+    # List membership belongs to this run's program page, not to the cached scrape
+    result.lists = course_lists(result.code, buckets_by_code)
+    return result
+
 # ---- Main -------------------------------------------------------------------
 
-async def run(program_url: str, out_path: Path, headful: bool, max_courses: Optional[int], debug_html_out: Optional[Path]):
+async def run(program_url: str, out_path: Path, headful: bool, max_courses: Optional[int], debug_html_out: Optional[Path], max_concurrency: int = 6, use_cache: bool = True, refresh: bool = False):
     t0 = time.time()
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # We'll stream results as we go so Ctrl-C preserves work
-    out_f = out_path.open("a", encoding="utf-8")
+    # We'll stream results as we go so Ctrl-C preserves work (unbuffered: writes are batched below)
+    out_f = out_path.open("ab", buffering=0)
 
     async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=not headful)
+        # Container-friendly flags: /dev/shm is often tiny and user namespaces unavailable
+        browser = await pw.chromium.launch(
+            headless=not headful,
+            chromium_sandbox=False,
+            args=["--disable-dev-shm-usage", "--no-sandbox"],
+        )
         context = await browser.new_context()
+        await context.route("**/*", block_heavy_resources)
+        await context.add_init_script(script=SCRAPER_INIT_JS)
         page = await context.new_page()
 
         # JSON capture (informational). We attach BEFORE any navigation.
-        # We'll map url -> True if we saw any JSON for it, and store JSON data for course extraction
+        # We'll map course id -> True if we saw any JSON for it, and store JSON data for course extraction
         json_seen_for_url: Dict[str, bool] = {}
         json_data_by_course_id: Dict[str, Dict[str, Any]] = {}  # course_id -> JSON data
-
-        def looks_like_json(ctype: Optional[str], url: str) -> bool:
-            ct = (ctype or "").lower()
-            return ("json" in ct) or url.endswith(".json") or "kuali.co/api" in url
+        # Course API URL as (prefix, suffix) around the course id, learned from the first
+        # course payload the SPA fetches; later courses are then fetched as JSON directly
+        known_cids: Set[str] = set()
+        api_template: Optional[Tuple[str, str]] = None
+        # Catalog payloads seen on the program page, before course ids are known: last path segment -> (url, payload)
+        early_json: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+        def remember_course_json(course_id: str, url: str, data: Dict[str, Any]):
+            nonlocal api_template
+            json_data_by_course_id[course_id] = data
+            path = url.split("?", 1)[0].rstrip("/")
+            if api_template is None and path.endswith("/" + course_id) and course_id in known_cids:
+                api_template = (path[:-len(course_id)], url[len(path):])
 
         async def on_response(resp):
             try:
                 url = resp.url
-                # We care mostly about the Kuali catalog endpoints
+                # Cheap URL checks first: this runs for every response of the page it is
+                # attached to, and only Kuali course payloads are worth reading
                 if ("uwaterloocm.kuali.co/api" not in url) and ("/api/v1/catalog" not in url):
                     return
-                ctype = resp.headers.get("content-type", "")
-                if looks_like_json(ctype, url):
-                    txt = await resp.text()
-                    t = txt.strip()
-                    if not t:
-                        return
-                    if t[0] in "{" and t[-1] == "}": # Check for JSON object
-                        json_seen_for_url[url] = True
-                        # Try to extract course data from JSON
-                        try:
-                            data = json.loads(txt)
-                            # Extract course ID from URL or JSON
-                            course_id_match = re.search(r"courses/view/([a-f0-9]+)", url)
-                            if not course_id_match:
-                                # Try to find course ID in JSON
-                                if isinstance(data, dict):
-                                    course_id = data.get("data", {}).get("id") or data.get("id")
-                                    if course_id:
-                                        json_data_by_course_id[course_id] = data
-                            else:
-                                course_id = course_id_match.group(1)
-                                json_data_by_course_id[course_id] = data
-                        except Exception:
-                            pass
+                path = url.split("?", 1)[0].rstrip("/")
+                tail = path.rsplit("/", 1)[-1]
+                course_id_match = KUALI_CID_RE.search(path)
+                course_id = course_id_match.group(1) if course_id_match else tail if tail in known_cids else None
+                if course_id is None:
+                    if not known_cids:
+                        # Still on the program page: keep payloads to match once the links are collected
+                        data = json_loads(await resp.body())
+                        if isinstance(data, dict):
+                            early_json[tail] = (url, data)
+                    return
+                json_seen_for_url[course_id] = True
+                data = json_loads(await resp.body())
+                if isinstance(data, dict):
+                    remember_course_json(course_id, url, data)
             except Exception:
                 pass
 
-        context.on("response", on_response)
-
-        # Go to program page and scrape program details first
-        program_details = await scrape_program_details(page, program_url, json_seen_for_url, debug_html_out) # Pass debug_html_out
+        # Go to program page and scrape program details first, with course links & buckets
+        # unless a fresh cached collection exists. The response listener is attached only
+        # around navigations (here and in the DOM fallback below): API fetches and cache hits
+        # load no pages, so a context-wide listener would mostly see nothing worth reading.
+        cached_links = load_program_links(program_url) if use_cache and not refresh else None
+        page.on("response", on_response)
+        try:
+            program_details, course_refs, membership = await scrape_program_details(
+                page, program_url, json_seen_for_url, debug_html_out, collect_links=cached_links is None
+            ) # Pass debug_html_out
+        finally:
+            page.remove_listener("response", on_response)
         # Write program details to the JSONL file (include raw HTML for fallback parsing)
-        program_dict = asdict(program_details)
-        if hasattr(program_details, 'raw_program_html') and program_details.raw_program_html:
-            program_dict['raw_program_html'] = program_details.raw_program_html
-        out_f.write(json.dumps(program_dict, ensure_ascii=False) + "\n")
-        out_f.flush()
+        # Fields are already plain dicts/lists/strings, so a shallow copy of __dict__ replaces asdict's
+        # recursive copy; it also carries the raw_program_html attribute set after construction
+        program_dict = dict(vars(program_details))
+        if not program_dict.get('raw_program_html'):
+            program_dict.pop('raw_program_html', None)
+        write_lines(out_f, [jsonl_line(program_dict)])
         print(f"Scraped program details for: {program_details.title}")
 
-        # Collect all course links & buckets from program page
-        # We need to re-navigate to the program_url after scraping details, as scrape_program_details might have changed the page.
-        await page.goto(program_url, wait_until="domcontentloaded")
-        await accept_cookies_if_present(page)
-        await wait_for_spa(page, heavy=True)
-
-        course_refs, membership = await collect_program_courses(page)
+        if cached_links is not None:
+            course_refs, membership = cached_links
+            print(f"Loaded course links from cache: {program_links_cache_path(program_url)}")
+        elif use_cache:
+            save_program_links(program_url, course_refs, membership)
 
         if max_courses:
             course_refs = course_refs[:max_courses]
 
         total = len(course_refs)
         print(f"Found {total} course links on program page.")
+        known_cids.update(cid for cid, _ in course_refs)
+        for cid in known_cids & early_json.keys():
+            json_seen_for_url[cid] = True
+            remember_course_json(cid, *early_json[cid])
+        early_json.clear()
         # Build quick lookup: code -> set(buckets)
         buckets_by_code = membership  # already that
 
-        # Visit each course and scrape details
-        for i, (cid, url) in enumerate(course_refs, start=1):
-            # Map buckets for this course by code (if we can resolve)
-            # We try to pre-guess the code from the url text (unknown here),
-            # but we'll update once the page loads and we know the exact code.
-            buckets = set()
-
-            try:
-                result = await scrape_course(page, cid, url, buckets, json_seen_for_url, json_data_by_course_id)
-
-                # If we now have a code, merge any buckets we learned from the program page
-                if result.code and result.code in buckets_by_code:
-                    result.lists = sorted(list(set(result.lists) | buckets_by_code[result.code]))
-
-                # Log line
-                print(f"[{i}/{total}] {result.code or cid} — JSON:{result.json_captured}")
-
-                # Stream to file as JSONL
-                out_f.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
-                out_f.flush()
-
-            except KeyboardInterrupt:
-                print("\nInterrupted by user. Partial results saved.")
-                break
-            except Exception as e:
-                print(f"[{i}/{total}] ERROR {cid}: {e}")
-                # still write a minimal record so we keep progress
-                minimal = CourseResult(
-                    course_id=cid,
-                    code=None, title=None, units=None, description=None,
-                    prerequisites=None, corequisites=None, antirequisites=None,
-                    lists=sorted(list(buckets)), source_url=url, json_captured=bool(json_seen_for_url.get(cid, False))
-                )
-                out_f.write(json.dumps(asdict(minimal), ensure_ascii=False) + "\n")
-                out_f.flush()
-
+        # Visit courses concurrently: a fixed pool of pages, each checked out by one worker at a time.
+        # Scraping is I/O-bound (navigation + SPA rendering), so k pages cut wall time ~k-fold.
+        # Each extra page gets its own BrowserContext (~80 MB) so workers don't contend on
+        # shared cookie/storage state and Chromium can render them in separate processes.
+        k = max(1, min(max_concurrency, total))
+        sem = asyncio.BoundedSemaphore(k)
+        pages_q: asyncio.Queue = asyncio.Queue()
+        pages_q.put_nowait(page)
+        worker_contexts = []
+        for _ in range(k - 1):
+            worker_context = await browser.new_context()
+            await worker_context.route("**/*", block_heavy_resources)
+            await worker_context.add_init_script(script=SCRAPER_INIT_JS)
+            worker_contexts.append(worker_context)
+            pages_q.put_nowait(await worker_context.new_page())
+
+        # Completed courses from earlier runs skip the browser entirely (--refresh re-scrapes, --no-cache ignores)
+        course_cache = open_course_cache(out_path.with_suffix(".cache.sqlite")) if use_cache else None
+        from_cache: Set[str] = set()
+
+        async def worker(cid: str, url: str):
+            if course_cache is not None and not refresh:
+                result = cached_course(course_cache, cid, buckets_by_code)
+                if result is not None:
+                    from_cache.add(cid)
+                    return cid, url, result, None
+            # A course payload the SPA already fetched (e.g. while loading the program page) needs no request at all
+            cached = json_data_by_course_id.get(cid)
+            result = course_from_json(cid, url, cached, buckets_by_code) if cached is not None else None
+            if result is not None:
+                return cid, url, result, None
+            async with sem:
+                if api_template is not None:
+                    result = await fetch_course_json(context, cid, url, api_template, buckets_by_code)
+                    if result is not None:
+                        return cid, url, result, None
+                # No API template yet (or the fetch failed): render the course page
+                course_page = await pages_q.get()
+                course_page.on("response", on_response)
+                try:
+                    result = await scrape_course(course_page, cid, url, buckets_by_code, json_seen_for_url, json_data_by_course_id)
+                    return cid, url, result, None
+                except Exception as e:
+                    return cid, url, None, e
+                finally:
+                    course_page.remove_listener("response", on_response)
+                    pages_q.put_nowait(course_page)
+
+        tasks = [asyncio.ensure_future(worker(cid, url)) for cid, url in course_refs]
+        pending: List[bytes] = []
+        last_write = time.monotonic()
+        try:
+            # Write each JSONL line as its course completes so Ctrl-C still preserves work
+            for i, fut in enumerate(asyncio.as_completed(tasks), start=1):
+                cid, url, result, err = await fut
+                if err is None:
+                    # Log line
+                    print(f"[{i}/{total}] {result.code or cid} — JSON:{result.json_captured}")
+                else:
+                    print(f"[{i}/{total}] ERROR {cid}: {err}")
+                    # still write a minimal record so we keep progress
+                    result = CourseResult(
+                        course_id=cid,
+                        code=None, title=None, units=None, description=None,
+                        prerequisites=None, corequisites=None, antirequisites=None,
+                        lists=[], source_url=url, json_captured=bool(json_seen_for_url.get(cid, False))
+                    )
+
+                # Stream to file as JSONL, one writev per batch instead of a write + flush per line
+                line = jsonl_line(result.to_dict())
+                pending.append(line)
+                if course_cache is not None and err is None and cid not in from_cache:
+                    course_cache.execute("INSERT OR REPLACE INTO course VALUES (?, ?, ?)", (cid, time.time(), line))
+                if len(pending) >= WRITE_BATCH_LINES or time.monotonic() - last_write >= WRITE_INTERVAL_S:
+                    write_lines(out_f, pending)
+                    pending.clear()
+                    if course_cache is not None:
+                        course_cache.commit()
+                    last_write = time.monotonic()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("\nInterrupted by user. Partial results saved.")
+            for task in tasks:
+                task.cancel()
+        finally:
+            if pending:
+                write_lines(out_f, pending)
+            if course_cache is not None:
+                course_cache.commit()
+                course_cache.close()
+
+        for worker_context in worker_contexts:
+            await worker_context.close()
         await context.close()
         await browser.close()
         out_f.close()
@@ -682,11 +1003,14 @@ def main():
     p.add_argument("--out", default="se_courses.jsonl", help="Output JSONL path.")
     p.add_argument("--headful", action="store_true", help="Run headed (helpful to watch).")
     p.add_argument("--max-courses", type=int, default=None, help="Limit number of courses (debug).")
+    p.add_argument("--max-concurrency", "--workers", type=int, default=6, help="Course pages scraped in parallel (default: 6).")
+    p.add_argument("--no-cache", action="store_true", help="Don't read or write the program-link (24h) and course (7-day) caches.")
+    p.add_argument("--refresh", action="store_true", help="Re-scrape everything but still update the caches.")
     # p.add_argument("--debug-html-out", type=Path, default=None, help="Output path for raw HTML content (debug).") # Commented out new argument
     args = p.parse_args()
 
     # asyncio.run(run(args.program_url, Path(args.out), args.headful, args.max_courses, args.debug_html_out))
-    asyncio.run(run(args.program_url, Path(args.out), args.headful, args.max_courses, None)) # Pass None for debug_html_out
+    asyncio.run(run(args.program_url, Path(args.out), args.headful, args.max_courses, None, args.max_concurrency, not args.no_cache, args.refresh)) # Pass None for debug_html_out
 
 if __name__ == "__main__":
     main()
@@ -5,15 +5,76 @@ UWFlow GraphQL API Client
 Fetches course data including prerequisites and ratings from uwflow.com/graphql
 """
 
+import asyncio
+import csv
+import io
 import json
+import os
+import sqlite3
+import threading
+import time
 import requests
-from dataclasses import dataclass, asdict
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, NamedTuple, Optional, Any, Set, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+
+from uwflow_common import iter_jsonl_lines, json_loads, jsonl_line
 
 UWFLOW_GRAPHQL_URL = "https://uwflow.com/graphql"
+# Raw course objects are cached by normalized code (<cache dir>/uwflow.sqlite) for re-runs
+UWFLOW_CACHE_DIR = Path.home() / ".cache" / "course-connect"
+UWFLOW_CACHE_TTL_S = 24 * 3600
+# Responses worth retrying: rate limiting and transient server/gateway errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Keep-alive connections pooled to uwflow.com; concurrent requests are capped to this so
+# every in-flight POST reuses a pooled connection instead of opening (and discarding) an extra one
+MAX_CONNECTIONS = 32
+
+# One keep-alive session for every GraphQL call, so courses after the first
+# skip the TCP + TLS handshake to uwflow.com (shared by the batch worker threads)
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is not None:
+        return _session
+    with _session_lock:
+        if _session is not None:
+            return _session
+        session = requests.Session()
+        # GraphQL reads are idempotent, so POSTs are retried too (urllib3 skips them by default),
+        # honouring Retry-After on 429/503; the last response is returned for raise_for_status
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONNECTIONS, max_retries=retry))
+        session.headers["Content-Type"] = "application/json"
+        # gzip/deflate, plus br/zstd when urllib3 can decode them (brotli/zstandard installed)
+        session.headers.update(make_headers(accept_encoding=True))
+        _session = session
+        return session
+
+def close_session() -> None:
+    """Close the shared session (its pooled connections); the next call opens a new one"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
 
-@dataclass
+@dataclass(slots=True)
 class UWFlowCourseResult:
     code: str
     name: Optional[str]
@@ -29,51 +90,120 @@ class UWFlowCourseResult:
     prerequisite_courses: List[Dict[str, str]]  # List of {code, name}
     source_url: str
 
-def fetch_course_graphql(course_code: str) -> Optional[Dict[str, Any]]:
-    normalized_code = course_code.lower().replace(' ', '')
-    
-    query = """
-    query getCourse($code: String) {
-      course(where: {code: {_eq: $code}}) {
-        code
-        name
-        description
-        prereqs
-        coreqs
-        antireqs
-        rating {
-          liked
-          easy
-          useful
-          filled_count
-          comment_count
+    def to_dict(self) -> Dict[str, Any]:
+        # Flat dict literal; asdict() would deep-copy every field recursively
+        return {
+            "code": self.code,
+            "name": self.name,
+            "description": self.description,
+            "prereqs": self.prereqs,
+            "coreqs": self.coreqs,
+            "antireqs": self.antireqs,
+            "rating_liked": self.rating_liked,
+            "rating_easy": self.rating_easy,
+            "rating_useful": self.rating_useful,
+            "rating_filled_count": self.rating_filled_count,
+            "rating_comment_count": self.rating_comment_count,
+            "prerequisite_courses": self.prerequisite_courses,
+            "source_url": self.source_url,
         }
-        prerequisites {
-          prerequisite {
-            code
-            name
-          }
-        }
-      }
-    }
+
+class CourseFields(NamedTuple):
     """
-    
-    variables = {"code": normalized_code}
-    
-    payload = {
-        "query": query,
-        "variables": variables
-    }
+    Optional parts of the course selection set. code, name and the prereqs/coreqs/antireqs
+    texts are always requested: that minimum is what parse_uwflow_prereqs.py needs.
+    """
+    description: bool = True
+    ratings: bool = True
+    prerequisites: bool = True  # structured prerequisite {code, name} list
+
+ALL_FIELDS = CourseFields()
+
+_FIELDS_CORE = "code name prereqs coreqs antireqs"
+_FIELDS_DESCRIPTION = "description"
+_FIELDS_RATINGS = "rating { liked easy useful filled_count comment_count }"
+_FIELDS_PREREQUISITES = "prerequisites { prerequisite { code name } }"
+
+def _selection(fields: CourseFields) -> str:
+    parts = [_FIELDS_CORE]
+    if fields.description:
+        parts.append(_FIELDS_DESCRIPTION)
+    if fields.ratings:
+        parts.append(_FIELDS_RATINGS)
+    if fields.prerequisites:
+        parts.append(_FIELDS_PREREQUISITES)
+    return " ".join(parts)
+
+_GET_COURSE_QUERY = "query getCourse($code: String) { course(where: {code: {_eq: $code}}) { %s } }"
+# Hasura list filter: one round-trip for a whole batch of codes
+_GET_COURSES_QUERY = "query getCourses($codes: [String!]) { course(where: {code: {_in: $codes}}) { %s } }"
+
+def _payload_parts(query: str, variable: str) -> Tuple[bytes, bytes]:
+    """
+    JSON request body around one variable's value, serialized once per query.
+    GraphQL ignores whitespace between tokens, so the query is sent compacted.
+    """
+    head = json.dumps({"query": " ".join(query.split())})[:-1]
+    return f'{head},"variables":{{"{variable}":'.encode(), b"}}"
+
+_GET_COURSE_PAYLOAD = _payload_parts(_GET_COURSE_QUERY % _selection(ALL_FIELDS), "code")
+
+@lru_cache(maxsize=None)
+def _courses_payload(fields: CourseFields) -> Tuple[bytes, bytes]:
+    return _payload_parts(_GET_COURSES_QUERY % _selection(fields), "codes")
+
+# Separators dropped from course codes in a single translate() pass
+_NORM_TABLE = str.maketrans('', '', ' \t\n-')
+
+def normalize_code(course_code: str) -> str:
+    """UWFlow course codes are lowercase without separators ("CS 146", "CS-146" -> "cs146")"""
+    return course_code.translate(_NORM_TABLE).lower()
+
+def open_course_cache(cache_dir: Path = UWFLOW_CACHE_DIR) -> sqlite3.Connection:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(cache_dir / "uwflow.sqlite")
+    conn.execute("CREATE TABLE IF NOT EXISTS course (code TEXT PRIMARY KEY, fetched_at REAL NOT NULL, payload BLOB NOT NULL)")
+    return conn
+
+def _cached_courses(conn: sqlite3.Connection, codes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fresh cached course objects for the given normalized codes"""
+    fresh_after = time.time() - UWFLOW_CACHE_TTL_S
+    courses: Dict[str, Dict[str, Any]] = {}
+    for code in codes:
+        row = conn.execute("SELECT payload FROM course WHERE code = ? AND fetched_at > ?", (code, fresh_after)).fetchone()
+        if row is None:
+            continue
+        try:
+            courses[code] = json_loads(row[0])
+        except ValueError:
+            pass
+    return courses
+
+def _store_courses(conn: sqlite3.Connection, courses: List[Dict[str, Any]]) -> None:
+    # The raw GraphQL object is stored, so UWFlowCourseResult changes don't invalidate the cache
+    now = time.time()
+    conn.executemany(
+        "INSERT OR REPLACE INTO course VALUES (?, ?, ?)",
+        [(course.get("code", ""), now, jsonl_line(course)) for course in courses]
+    )
+    conn.commit()
+
+def fetch_course_graphql(course_code: str, cache: Optional[sqlite3.Connection] = None) -> Optional[Dict[str, Any]]:
+    normalized_code = normalize_code(course_code)
+    if cache is not None:
+        cached = _cached_courses(cache, [normalized_code]).get(normalized_code)
+        if cached is not None:
+            return cached
+    prefix, suffix = _GET_COURSE_PAYLOAD
     
     try:
-        response = requests.post(
+        response = _get_session().post(
             UWFLOW_GRAPHQL_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
+            data=prefix + json.dumps(normalized_code).encode() + suffix,
             timeout=10
         )
         response.raise_for_status()
-        data = response.json()
+        data = json_loads(response.content)
         
         if "errors" in data:
             print(f"GraphQL errors for {course_code}: {data['errors']}")
@@ -84,77 +214,332 @@ def fetch_course_graphql(course_code: str) -> Optional[Dict[str, Any]]:
             print(f"  No course found for {course_code} (normalized: {normalized_code})")
             return None
         
-        return course[0] if isinstance(course, list) else course
+        course = course[0] if isinstance(course, list) else course
+        if cache is not None:
+            _store_courses(cache, [course])
+        return course
     except Exception as e:
         print(f"Error fetching {course_code}: {e}")
         return None
 
-def fetch_course(course_code: str) -> Optional[UWFlowCourseResult]:
+def _batches(codes: List[str], batch_size: int) -> List[List[str]]:
+    return [codes[start:start + batch_size] for start in range(0, len(codes), batch_size)]
+
+def _split_cached(course_codes: List[str], cache: Optional[sqlite3.Connection]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """(cached courses, unique normalized codes still to fetch, in input order)"""
+    codes = list(dict.fromkeys(normalize_code(code) for code in course_codes))
+    if cache is None:
+        return {}, codes
+    cached = _cached_courses(cache, codes)
+    return cached, [code for code in codes if code not in cached]
+
+def _index_courses(courses: Dict[str, Dict[str, Any]], batch: List[str], batch_courses: Optional[List[Dict[str, Any]]],
+                   failed: Optional[Set[str]]) -> None:
+    if batch_courses is None:
+        if failed is not None:
+            failed.update(batch)
+        return
+    for course in batch_courses:
+        courses[course.get("code", "")] = course
+
+def _fetch_batch(codes: List[str], fields: CourseFields = ALL_FIELDS) -> Optional[List[Dict[str, Any]]]:
+    """
+    One `_in` query for a batch of normalized codes.
+    Returns the courses found, or None when the request itself failed (after the session's retries).
+    """
+    prefix, suffix = _courses_payload(fields)
+    try:
+        response = _get_session().post(
+            UWFLOW_GRAPHQL_URL,
+            data=prefix + json.dumps(codes).encode() + suffix,
+            timeout=10
+        )
+        response.raise_for_status()
+        data = json_loads(response.content)
+        
+        if "errors" in data:
+            print(f"GraphQL errors for {', '.join(codes)}: {data['errors']}")
+            return None
+        
+        return data.get("data", {}).get("course") or []
+    except (requests.ConnectionError, requests.Timeout) as e:
+        print(f"Error fetching {', '.join(codes)} (network, retries exhausted): {e}")
+        return None
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        kind = "retries exhausted" if status in RETRY_STATUSES else "not retryable"
+        print(f"Error fetching {', '.join(codes)} (HTTP {status}, {kind}): {e}")
+        return None
+    except Exception as e:
+        print(f"Error fetching {', '.join(codes)}: {e}")
+        return None
+
+def fetch_courses_graphql(course_codes: List[str], batch_size: int = 50, concurrency: int = 8,
+                          cache: Optional[sqlite3.Connection] = None,
+                          fields: CourseFields = ALL_FIELDS,
+                          failed: Optional[Set[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch many courses with one `_in` query per batch of codes, up to `concurrency`
+    batches in flight at once over the shared session. With a cache, only codes
+    missing from it (or stale) are requested, and fetched courses are stored.
+    A reduced `fields` selection skips the cache, which only holds complete objects.
+    Returns normalized code -> course data; codes UWFlow doesn't know are absent.
+    Codes whose request failed are added to `failed`, when given.
+    """
+    if fields != ALL_FIELDS:
+        cache = None
+    courses, missing = _split_cached(course_codes, cache)
+    batches = _batches(missing, batch_size)
+    fetched: Dict[str, Dict[str, Any]] = {}
+    
+    if len(batches) <= 1 or concurrency <= 1:
+        for batch in batches:
+            _index_courses(fetched, batch, _fetch_batch(batch, fields), failed)
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches), MAX_CONNECTIONS)) as ex:
+            futures = {ex.submit(_fetch_batch, batch, fields): batch for batch in batches}
+            for fut in as_completed(futures):
+                _index_courses(fetched, futures[fut], fut.result(), failed)
+    
+    if cache is not None and fetched:
+        _store_courses(cache, list(fetched.values()))
+    courses.update(fetched)
+    return courses
+
+async def fetch_courses_async(course_codes: List[str], batch_size: int = 50, concurrency: int = 8,
+                              cache: Optional[sqlite3.Connection] = None,
+                              fields: CourseFields = ALL_FIELDS,
+                              failed: Optional[Set[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Awaitable fetch_courses_graphql for asyncio callers (e.g. alongside the Playwright scraper).
+    Batches run in worker threads over the shared session, at most `concurrency` at once;
+    the cache is only touched from the calling thread.
+    """
+    if fields != ALL_FIELDS:
+        cache = None
+    sem = asyncio.Semaphore(max(1, min(concurrency, MAX_CONNECTIONS)))
+    
+    async def one(batch: List[str]) -> Optional[List[Dict[str, Any]]]:
+        async with sem:
+            return await asyncio.to_thread(_fetch_batch, batch, fields)
+    
+    courses, missing = _split_cached(course_codes, cache)
+    batches = _batches(missing, batch_size)
+    fetched: Dict[str, Dict[str, Any]] = {}
+    for batch, batch_courses in zip(batches, await asyncio.gather(*(one(batch) for batch in batches))):
+        _index_courses(fetched, batch, batch_courses, failed)
+    if cache is not None and fetched:
+        _store_courses(cache, list(fetched.values()))
+    courses.update(fetched)
+    return courses
+
+def _course_to_row(course_data: Dict[str, Any], original_code: str) -> Dict[str, Any]:
+    """One GraphQL course object as an output row (UWFlowCourseResult's fields, in order)"""
+    # Bound .get methods: one attribute lookup each instead of one per field
+    get = course_data.get
+    # null (not just absent) for courses nobody has rated yet
+    rating = (get("rating") or {}).get
+    
+    prerequisite_courses = [
+        {"code": prereq.get("code", ""), "name": prereq.get("name", "")}
+        for prereq_rel in get("prerequisites", [])
+        if (prereq := prereq_rel.get("prerequisite", {}))
+    ]
+    
+    return {
+        "code": get("code", original_code.upper()),
+        "name": get("name"),
+        "description": get("description"),
+        "prereqs": get("prereqs"),
+        "coreqs": get("coreqs"),
+        "antireqs": get("antireqs"),
+        "rating_liked": rating("liked"),
+        "rating_easy": rating("easy"),
+        "rating_useful": rating("useful"),
+        "rating_filled_count": rating("filled_count"),
+        "rating_comment_count": rating("comment_count"),
+        "prerequisite_courses": prerequisite_courses,
+        "source_url": f"https://uwflow.com/course/{get('code', original_code).lower()}",
+    }
+
+def _build_result(course_data: Dict[str, Any], original_code: str) -> UWFlowCourseResult:
+    """Parse one GraphQL course object into a UWFlowCourseResult"""
+    return UWFlowCourseResult(**_course_to_row(course_data, original_code))
+
+def fetch_course(course_code: str, cache: Optional[sqlite3.Connection] = None) -> Optional[UWFlowCourseResult]:
     """Fetch and parse a single course from UWFlow"""
-    course_data = fetch_course_graphql(course_code)
+    course_data = fetch_course_graphql(course_code, cache)
     
     if not course_data:
         return None
     
-    rating = course_data.get("rating", {})
-    prerequisite_courses = []
-    
-    for prereq_rel in course_data.get("prerequisites", []):
-        prereq = prereq_rel.get("prerequisite", {})
-        if prereq:
-            prerequisite_courses.append({
-                "code": prereq.get("code", ""),
-                "name": prereq.get("name", "")
-            })
-    
-    return UWFlowCourseResult(
-        code=course_data.get("code", course_code.upper()),
-        name=course_data.get("name"),
-        description=course_data.get("description"),
-        prereqs=course_data.get("prereqs"),
-        coreqs=course_data.get("coreqs"),
-        antireqs=course_data.get("antireqs"),
-        rating_liked=rating.get("liked"),
-        rating_easy=rating.get("easy"),
-        rating_useful=rating.get("useful"),
-        rating_filled_count=rating.get("filled_count"),
-        rating_comment_count=rating.get("comment_count"),
-        prerequisite_courses=prerequisite_courses,
-        source_url=f"https://uwflow.com/course/{course_data.get('code', course_code).lower()}"
-    )
+    return _build_result(course_data, course_code)
 
-def fetch_multiple_courses(course_codes: List[str], output_path: Path):
-    """Fetch multiple courses from UWFlow"""
-    results = []
-    
-    for i, code in enumerate(course_codes, 1):
-        print(f"[{i}/{len(course_codes)}] Fetching {code}...")
-        result = fetch_course(code)
-        if result:
-            results.append(asdict(result))
-            print(f"  ✓ {result.code}: {result.name or 'No name'}")
-            if result.rating_liked is not None:
-                print(f"    Rating: {result.rating_liked:.1%} liked, {result.rating_easy:.1%} easy, {result.rating_useful:.1%} useful")
-            if result.prerequisite_courses:
-                print(f"    Prerequisites: {', '.join([p['code'] for p in result.prerequisite_courses])}")
-        else:
-            print(f"  ✗ Failed to fetch {code}")
-    
-    # Write results to JSONL
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for result in results:
-            f.write(json.dumps(result, ensure_ascii=False) + '\n')
-    
-    print(f"\nDone! Fetched {len(results)}/{len(course_codes)} courses. Output → {output_path}")
+def _written_rows(output_path: Path) -> Dict[str, List[str]]:
+    """
+    Rows already in an output JSONL (for --resume): normalized code -> its prerequisite codes.
+    A last line cut short by a crash is truncated away, so its course is fetched again
+    and appended rows start on a fresh line.
+    """
+    if not output_path.exists():
+        return {}
+    with open(output_path, 'r+b') as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+    rows: Dict[str, List[str]] = {}
+    for line in iter_jsonl_lines(output_path):
+        try:
+            row = json_loads(line)
+        except ValueError:
+            continue
+        rows[normalize_code(row.get("code") or "")] = [p.get("code", "") for p in row.get("prerequisite_courses") or []]
+    return rows
+
+def fetch_multiple_courses(course_codes: List[str], output_path: Path, batch_size: int = 50, concurrency: int = 8,
+                           cache_dir: Optional[Path] = UWFLOW_CACHE_DIR, resume: bool = False,
+                           fields: CourseFields = ALL_FIELDS, verbose: bool = False, transitive: bool = False,
+                           report_path: Optional[Path] = None):
+    """
+    Fetch multiple courses from UWFlow (batch_size codes per GraphQL request, concurrency requests at once).
+    Courses fetched within UWFLOW_CACHE_TTL_S are read from cache_dir instead; None disables the cache.
+    
+    Rows are appended to output_path as each window of batch_size * concurrency codes
+    completes, so memory stays bounded and a crash keeps finished windows. With resume,
+    codes already in output_path are skipped and new rows are appended to it.
+    Fields left out of `fields` are written as null (or [] for prerequisite_courses).
+    Progress is one line per window; verbose adds a line per course (failures always print),
+    and report_path gets a TSV row per fetched course (code, name, ratings, prerequisites).
+    Codes that normalize to the same UWFlow code are fetched and written once.
+    
+    With transitive, the prerequisite_courses of every fetched course are queued too
+    (breadth-first, until no unseen code is left), so the output is the whole prerequisite
+    closure of the input, still with one request per batch and one row per course.
+    """
+    # Keep the first spelling of each code, in input order
+    unique: Dict[str, str] = {}
+    for code in course_codes:
+        unique.setdefault(normalize_code(code), code)
+    if len(unique) < len(course_codes):
+        print(f"Skipping {len(course_codes) - len(unique)} duplicate course codes")
+    course_codes = list(unique.values())
+    # Every normalized code queued or already written; course_codes doubles as the BFS worklist
+    seen = set(unique)
+    
+    def enqueue(codes: List[str]) -> None:
+        for code in codes:
+            key = normalize_code(code)
+            if key and key not in seen:
+                seen.add(key)
+                course_codes.append(code)
+    
+    total = len(course_codes)
+    if resume:
+        written = _written_rows(output_path)
+        course_codes = [code for code in course_codes if normalize_code(code) not in written]
+        print(f"Resuming: {total - len(course_codes)} courses already in {output_path}")
+        seen.update(written)
+        if transitive:
+            # Rows written before the interruption may still have unfetched prerequisites
+            for prereq_codes in written.values():
+                enqueue(prereq_codes)
+    stats: Counter = Counter()
+    failed: Set[str] = set()  # normalized codes whose request failed (worth retrying), vs. not on UWFlow
+    window = max(1, batch_size * concurrency)
+    
+    cache = open_course_cache(cache_dir) if cache_dir is not None else None
+    report = open(report_path, 'w', newline='', encoding='utf-8') if report_path is not None else None
+    try:
+        if report is not None:
+            report_writer = csv.writer(report, delimiter='\t')
+            report_writer.writerow(["code", "name", "rating_liked", "rating_easy", "rating_useful", "prerequisites"])
+        print(f"Fetching {len(course_codes)} courses ({batch_size} per request, {concurrency} requests at once)...")
+        # Binary rows from jsonl_line (orjson when installed), joined per window and written
+        # through a 1 MiB buffer: no text encoder pass, and one write(2) per window instead of
+        # per row (a run that fits in one window is a single write)
+        with open(output_path, 'ab' if resume else 'wb', buffering=0) as raw, io.BufferedWriter(raw, buffer_size=1 << 20) as f:
+            start = 0
+            while start < len(course_codes):
+                chunk = course_codes[start:start + window]
+                courses = fetch_courses_graphql(chunk, batch_size, concurrency, cache, fields, failed)
+                lines: List[bytes] = []
+                report_rows = []
+                
+                for i, code in enumerate(chunk, start + 1):
+                    course_data = courses.get(normalize_code(code))
+                    if course_data:
+                        # Rows go straight from the GraphQL object to JSONL, without a UWFlowCourseResult
+                        row = _course_to_row(course_data, code)
+                        lines.append(jsonl_line(row))
+                        stats["fetched"] += 1
+                        stats["with_rating"] += row["rating_liked"] is not None
+                        stats["with_prereqs"] += bool(row["prerequisite_courses"])
+                        if report is not None:
+                            report_rows.append((
+                                row["code"], row["name"], row["rating_liked"], row["rating_easy"], row["rating_useful"],
+                                ",".join(p["code"] for p in row["prerequisite_courses"]),
+                            ))
+                        if transitive:
+                            enqueue([p["code"] for p in row["prerequisite_courses"]])
+                        if verbose:
+                            print(f"[{i}/{len(course_codes)}] ✓ {row['code']}: {row['name'] or 'No name'}")
+                            if row["rating_liked"] is not None:
+                                print(f"    Rating: {row['rating_liked']:.1%} liked, {row['rating_easy']:.1%} easy, {row['rating_useful']:.1%} useful")
+                            if row["prerequisite_courses"]:
+                                print(f"    Prerequisites: {', '.join([p['code'] for p in row['prerequisite_courses']])}")
+                    elif normalize_code(code) in failed:
+                        print(f"[{i}/{len(course_codes)}] ✗ Failed to fetch {code}")
+                    else:
+                        stats["not_found"] += 1
+                        print(f"[{i}/{len(course_codes)}] ✗ Not on UWFlow: {code}")
+                
+                # Each finished window is on disk before the next one is requested
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+                if report is not None:
+                    report_writer.writerows(report_rows)
+                start += len(chunk)
+                if not verbose:
+                    print(f"[{start}/{len(course_codes)}] {stats['fetched']} fetched so far")
+    finally:
+        close_session()
+        if cache is not None:
+            cache.close()
+        if report is not None:
+            report.close()
+    
+    print(f"\nDone! Fetched {stats['fetched']}/{len(course_codes)} courses "
+          f"({stats['with_rating']} rated, {stats['with_prereqs']} with prerequisites, "
+          f"{stats['not_found']} not on UWFlow). Output → {output_path}")
+    if failed:
+        print(f"{len(failed)} courses failed to fetch; re-run with --resume to retry them.")
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Fetch course data from UWFlow GraphQL API")
     parser.add_argument("courses", nargs="+", help="Course codes (e.g., cs449 cs241 CS 146)")
     parser.add_argument("--out", default="uwflow_courses.jsonl", help="Output JSONL path")
+    parser.add_argument("--batch-size", type=int, default=50, help="Course codes per GraphQL request (default: 50)")
+    parser.add_argument("--concurrency", type=int, default=8, help="GraphQL requests in flight at once (default: 8)")
+    parser.add_argument("--cache-dir", type=Path, default=UWFLOW_CACHE_DIR, help=f"Response cache directory (default: {UWFLOW_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the 24h response cache.")
+    parser.add_argument("--resume", action="store_true", help="Skip courses already in --out and append the rest.")
+    parser.add_argument("--no-description", action="store_true", help="Don't request course descriptions.")
+    parser.add_argument("--no-ratings", action="store_true", help="Don't request rating fields.")
+    parser.add_argument("--no-prerequisite-courses", action="store_true", help="Don't request the structured prerequisite list (the prereqs text is kept).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print a line per course (name, rating, prerequisites).")
+    parser.add_argument("--transitive", action="store_true", help="Also fetch every course's prerequisites, recursively.")
+    parser.add_argument("--report", type=Path, default=None, help="Also write a TSV row per course (code, name, ratings, prerequisites).")
     args = parser.parse_args()
     
-    fetch_multiple_courses(args.courses, Path(args.out))
+    fields = CourseFields(
+        description=not args.no_description,
+        ratings=not args.no_ratings,
+        prerequisites=not args.no_prerequisite_courses,
+    )
+    fetch_multiple_courses(args.courses, Path(args.out), args.batch_size, args.concurrency,
+                           None if args.no_cache else args.cache_dir, args.resume, fields, args.verbose, args.transitive, args.report)
 
 if __name__ == "__main__":
     main()
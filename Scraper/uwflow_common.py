@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Course-code normalization and JSON/JSONL I/O shared by the UWFlow scripts
+(uwflow_api.py, merge_uwflow_data.py, parse_uwflow_prereqs.py).
+"""
+
+import json
+import mmap
+import os
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import re2 as _code_re  # google-re2: linear-time automaton, same API as re
+except ImportError:
+    _code_re = re
+
+COURSE_RE = _code_re.compile(r"\b([A-Z]{2,6})\s?(\d{2,4}[A-Z]?)\b")
+# Pattern: 2-6 letters followed by 2-4 digits optionally followed by a letter
+_CODE_EXACT_RE = re.compile(r"^([A-Z]{2,6})(\d{2,4}[A-Z]?)$")
+HAS_DIGIT_RE = re.compile(r"\d")
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+def write_json(path: Path, obj: Any, ensure_ascii: bool, pretty: bool = False) -> None:
+    """Write obj as compact JSON, or 2-space-indented when pretty (orjson when installed)."""
+    if orjson is not None:
+        option = orjson.OPT_APPEND_NEWLINE | (orjson.OPT_INDENT_2 if pretty else 0)
+        path.write_bytes(orjson.dumps(obj, option=option))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        if pretty:
+            json.dump(obj, f, indent=2, ensure_ascii=ensure_ascii)
+        else:
+            json.dump(obj, f, separators=(',', ':'), ensure_ascii=ensure_ascii)
+        f.write('\n')
+
+def jsonl_line(obj: Any) -> bytes:
+    """One JSONL record as UTF-8 bytes, newline included (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8')
+
+def iter_jsonl_lines(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """Yield the non-blank raw lines of a JSONL file whose first byte falls in [start, end).
+
+    The file is memory-mapped and split with find(b"\\n"): lines stay bytes (no text
+    decoding), which orjson/json parse directly.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:  # mmap cannot map an empty file
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = size if end is None else min(end, size)
+            pos = 0
+            if start:
+                # The line straddling `start` belongs to the previous range
+                nl = mm.find(b"\n", start - 1)
+                pos = size if nl == -1 else nl + 1
+            while pos < end:
+                nl = mm.find(b"\n", pos)
+                if nl == -1:
+                    nl = size
+                line = mm[pos:nl]
+                if line.strip():
+                    yield line
+                pos = nl + 1
+
+@lru_cache(maxsize=8192)
+def norm(code: str) -> str:
+    """Normalize course code to uppercase without spaces (memoized; codes repeat heavily)"""
+    if not code:
+        return ""
+    # Try uppercase first, then lowercase
+    code_upper = code.upper()
+    m = COURSE_RE.search(code_upper)
+    if m:
+        return sys.intern((m.group(1) + m.group(2)).upper())
+    # If no match, try to extract pattern manually (e.g., "cs341" -> "CS341")
+    code_no_spaces = code.upper().replace(' ', '')
+    match = _CODE_EXACT_RE.match(code_no_spaces)
+    if match:
+        return sys.intern(match.group(1) + match.group(2))
+    return ""
+
+def find_codes(text: str) -> List[str]:
+    """Extract all course codes from text"""
+    # Every code has digits; prose-only clauses are rejected by a plain C scan
+    if not text or not HAS_DIGIT_RE.search(text):
+        return []
+    return [sys.intern((a + b).upper()) for a, b in COURSE_RE.findall(text)]